@@ -0,0 +1,180 @@
+"""
+Circuit Breaker - Fail fast while an upstream is down
+
+Features:
+- Closed / open / half-open states
+- Opens when the failure rate over the last `window` calls reaches `threshold`
+  (once at least `min_calls` have been seen)
+- While open, calls are rejected immediately; after `cooldown` seconds one
+  probe call is let through (half-open) and its outcome closes or re-opens it
+- Only the probe changes a tripped circuit: late outcomes of calls admitted
+  while it was closed are ignored
+- Prometheus metrics for the current state and every transition
+
+Usage:
+    breaker = CircuitBreaker('prometheus')
+
+    ticket = breaker.allow()
+    if not ticket:
+        raise CircuitOpenError('prometheus')
+    try:
+        result = call_upstream()
+    except Exception:
+        breaker.record_failure(ticket)
+        raise
+    breaker.record_success(ticket)
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from prometheus_client import Counter, Gauge
+
+from telemetry_middleware import registry
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Tickets returned by allow(): a regular call, or the single half-open probe
+CALL = 'call'
+PROBE = 'probe'
+
+circuit_breaker_state = Gauge(
+    'circuit_breaker_state',
+    'Circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ['breaker'],
+    registry=registry,
+    # Worst state among live workers
+    multiprocess_mode='livemax'
+)
+
+circuit_breaker_transitions_total = Counter(
+    'circuit_breaker_transitions_total',
+    'Circuit breaker state transitions',
+    ['breaker', 'from_state', 'to_state'],
+    registry=registry
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name):
+        super().__init__(f"circuit '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker.
+
+    Args:
+        name: Label for metrics and logs
+        threshold: Failure rate (0-1) over the window that opens the circuit
+        min_calls: Calls needed in the window before the rate is trusted
+        window: Number of most recent call outcomes considered
+        cooldown: Seconds to stay open before letting a probe through
+        clock: Monotonic time source (for tests)
+    """
+
+    def __init__(self, name, threshold=0.5, min_calls=5, window=20, cooldown=30.0, clock=time.monotonic):
+        self.name = name
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)  # True for failure
+        self._state = CLOSED
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        circuit_breaker_state.labels(breaker=name).set(STATE_VALUES[CLOSED])
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """
+        Admit a call; only one probe at a time when half-open.
+
+        Returns:
+            None when rejected, else a ticket (CALL or PROBE) to pass to
+            record_success/record_failure
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return CALL
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.cooldown:
+                    return None
+                self._transition(HALF_OPEN)
+            if self._probing:
+                return None
+            self._probing = True
+            return PROBE
+
+    def record_success(self, ticket=CALL):
+        with self._lock:
+            if ticket == PROBE:
+                self._probing = False
+                if self._state == HALF_OPEN:
+                    self._outcomes.clear()
+                    self._transition(CLOSED)
+            elif self._state != CLOSED:
+                # Admitted before the circuit tripped; says nothing about recovery
+                return
+            self._outcomes.append(False)
+
+    def record_failure(self, ticket=CALL):
+        with self._lock:
+            if ticket == PROBE:
+                self._probing = False
+                if self._state == HALF_OPEN:
+                    self._open()
+                return
+            if self._state != CLOSED:
+                return
+            self._outcomes.append(True)
+            if len(self._outcomes) >= self.min_calls:
+                if sum(self._outcomes) / len(self._outcomes) >= self.threshold:
+                    self._open()
+
+    def snapshot(self):
+        """State for health checks, without calling the upstream."""
+        state = self.state
+        with self._lock:
+            outcomes = len(self._outcomes)
+            failure_rate = sum(self._outcomes) / outcomes if outcomes else 0.0
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(0.0, round(self.cooldown - (self._clock() - self._opened_at), 1))
+        return {
+            'state': state,
+            'failure_rate': round(failure_rate, 3),
+            'calls': outcomes,
+            'retry_in': retry_in,
+        }
+
+    def _open(self):
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self._transition(OPEN)
+
+    def _transition(self, state):
+        if state == self._state:
+            return
+        logger.warning(f"Circuit '{self.name}' {self._state} -> {state}")
+        circuit_breaker_transitions_total.labels(breaker=self.name, from_state=self._state, to_state=state).inc()
+        circuit_breaker_state.labels(breaker=self.name).set(STATE_VALUES[state])
+        self._state = state
@@ -0,0 +1,211 @@
+"""
+HTTP Client - Pooled, keep-alive outbound HTTP for every upstream the app calls
+
+Features:
+- One requests.Session per upstream, with its own keep-alive connection pool
+- Per-upstream timeouts and retry budgets
+- Retry with full-jitter exponential backoff for idempotent GETs
+  (connection failures and 502/503/504 only; read timeouts are not retried)
+- Prometheus metrics for per-upstream latency, retries and pool saturation
+- Calls made while serving a request are timed as its 'upstream.<name>' phase
+
+Usage:
+    from app import http_client
+
+    response = http_client.get('prometheus', url, params={'query': 'up'})
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge, Histogram
+
+from telemetry_middleware import phase, registry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {502, 503, 504}
+
+# Per-upstream defaults: timeout is (connect, read) seconds
+UPSTREAMS = {
+    'prometheus': {'timeout': (1, 5), 'retries': 1, 'pool_size': 8},
+    'weatherapi': {'timeout': (2, 5), 'retries': 2, 'pool_size': 2},
+}
+
+DEFAULT_UPSTREAM = {'timeout': (2, 10), 'retries': 0, 'pool_size': 4}
+
+outbound_request_duration_seconds = Histogram(
+    'outbound_request_duration_seconds',
+    'Outbound HTTP request latency in seconds',
+    ['upstream', 'outcome'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+    registry=registry
+)
+
+outbound_retries_total = Counter(
+    'outbound_retries_total',
+    'Outbound HTTP requests retried after a transient failure',
+    ['upstream'],
+    registry=registry
+)
+
+outbound_requests_in_flight = Gauge(
+    'outbound_requests_in_flight',
+    'Outbound HTTP requests currently in progress',
+    ['upstream'],
+    registry=registry,
+    multiprocess_mode='livesum'
+)
+
+outbound_pool_size = Gauge(
+    'outbound_pool_size',
+    'Maximum pooled keep-alive connections per upstream',
+    ['upstream'],
+    registry=registry,
+    multiprocess_mode='livesum'
+)
+
+outbound_pool_saturated_total = Counter(
+    'outbound_pool_saturated_total',
+    'Outbound requests started while every pooled connection was busy',
+    ['upstream'],
+    registry=registry
+)
+
+
+class OutboundClient:
+    """
+    Registry of pooled sessions, one per upstream.
+
+    Args:
+        upstreams: Mapping of upstream name to {'timeout', 'retries', 'pool_size'}
+        backoff_base: Base delay in seconds for retry backoff
+        backoff_cap: Maximum delay in seconds between retries
+    """
+
+    def __init__(self, upstreams=None, backoff_base=0.1, backoff_cap=2.0):
+        self.upstreams = {name: dict(config) for name, config in (upstreams or UPSTREAMS).items()}
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._in_flight = {}
+
+    def configure(self, upstream, **config):
+        """Override timeout/retries/pool_size for an upstream (before first use)."""
+        with self._lock:
+            self.upstreams.setdefault(upstream, dict(DEFAULT_UPSTREAM)).update(config)
+            session = self._sessions.pop(upstream, None)
+        if session is not None:
+            session.close()
+
+    def get(self, upstream, url, params=None, timeout=None, **kwargs):
+        """
+        GET url through the upstream's pooled session.
+
+        Args:
+            upstream: Upstream name used for pooling, config and metric labels
+            url: Request URL
+            params: Query parameters
+            timeout: Overrides the upstream's default timeout
+
+        Returns:
+            requests.Response (raises requests.RequestException after the last failed attempt)
+        """
+        config = self.upstreams.get(upstream, DEFAULT_UPSTREAM)
+        session = self._session(upstream, config)
+        timeout = timeout if timeout is not None else config['timeout']
+        attempts = config['retries'] + 1
+
+        # Request threads get an upstream phase in Server-Timing; pool threads are not timed
+        with phase(f'upstream.{upstream}'):
+            for attempt in range(attempts):
+                last_attempt = attempt == attempts - 1
+                self._begin(upstream, config)
+                started = time.perf_counter()
+                outcome = 'error'
+                try:
+                    response = session.get(url, params=params, timeout=timeout, **kwargs)
+                    outcome = 'success' if response.status_code < 400 else 'http_error'
+                    if response.status_code not in RETRY_STATUSES or last_attempt:
+                        return response
+                    response.close()
+                except requests.ConnectionError as e:
+                    if last_attempt:
+                        raise
+                    logger.warning(f"Retrying {upstream} request after connection failure: {e}")
+                finally:
+                    outbound_request_duration_seconds.labels(upstream=upstream, outcome=outcome).observe(
+                        time.perf_counter() - started
+                    )
+                    self._end(upstream)
+
+                outbound_retries_total.labels(upstream=upstream).inc()
+                time.sleep(self._backoff(attempt))
+
+    def reset(self):
+        """Close every pooled connection."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+            self._in_flight = {}
+        for session in sessions.values():
+            session.close()
+
+    def _after_fork(self):
+        # The parent's lock may have been held at fork time; its sockets belong to the parent
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._in_flight = {}
+
+    def _session(self, upstream, config):
+        session = self._sessions.get(upstream)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(upstream)
+            if session is None:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config['pool_size'])
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[upstream] = session
+                outbound_pool_size.labels(upstream=upstream).set(config['pool_size'])
+        return session
+
+    def _begin(self, upstream, config):
+        with self._lock:
+            in_flight = self._in_flight.get(upstream, 0) + 1
+            self._in_flight[upstream] = in_flight
+        outbound_requests_in_flight.labels(upstream=upstream).inc()
+        if in_flight > config['pool_size']:
+            # urllib3 opens a throwaway connection past pool_maxsize
+            outbound_pool_saturated_total.labels(upstream=upstream).inc()
+
+    def _end(self, upstream):
+        with self._lock:
+            self._in_flight[upstream] = max(self._in_flight.get(upstream, 1) - 1, 0)
+        outbound_requests_in_flight.labels(upstream=upstream).dec()
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+
+client = OutboundClient()
+
+
+def get(upstream, url, params=None, timeout=None, **kwargs):
+    """GET through the shared client (see OutboundClient.get)"""
+    return client.get(upstream, url, params=params, timeout=timeout, **kwargs)
+
+
+# Pooled sockets must not be shared between a parent and its forked workers
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=client._after_fork)
@@ -0,0 +1,181 @@
+"""
+Metrics Stream - Server-Sent Events fan-out for the live monitoring dashboard
+
+A single producer thread builds the dashboard payload once per tick and every
+connected client receives the same serialized event, so server work does not
+grow with the number of viewers.
+
+Features:
+- One producer per process, started on the first subscriber and stopped after the last
+- Producer state (cursor) reset on every start, so a new run begins with a full snapshot
+- Connection limit (clients past it get None from subscribe())
+- Heartbeat comments so proxies keep idle connections open
+- Resume from Last-Event-ID using a short replay history
+
+Configuration (environment):
+    METRICS_STREAM_INTERVAL     Seconds between producer ticks (default: 15)
+    METRICS_STREAM_MAX_CLIENTS  Maximum concurrent stream connections (default: 20; under
+                                gunicorn, derived from the worker's thread count)
+    METRICS_STREAM_HEARTBEAT    Seconds between keepalive comments (default: 15)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsBroadcaster:
+    """
+    Produce payloads on a timer and broadcast them to SSE subscribers.
+
+    The producer may keep state between ticks in the 'cursor' attribute, e.g.
+    to publish only what changed since the previous tick. It is reset to None
+    whenever a producer starts, and fresh subscribers start at that run's first
+    event rather than at the previous run's last one.
+
+    Args:
+        produce: Zero-argument callable returning a JSON-serializable payload (or None to skip a tick)
+        interval: Seconds between producer ticks
+        max_clients: Maximum concurrent subscribers
+        heartbeat: Seconds of silence before a keepalive comment is sent
+        history: Number of recent events kept for Last-Event-ID replay
+        event: SSE event name
+    """
+
+    def __init__(self, produce, interval=None, max_clients=None, heartbeat=None, history=20, event='metrics'):
+        self.produce = produce
+        self.interval = float(interval if interval is not None else os.getenv('METRICS_STREAM_INTERVAL', 15))
+        self.max_clients = int(max_clients if max_clients is not None else os.getenv('METRICS_STREAM_MAX_CLIENTS', 20))
+        self.heartbeat = float(heartbeat if heartbeat is not None else os.getenv('METRICS_STREAM_HEARTBEAT', 15))
+        self.event = event
+
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)  # (event_id, encoded chunk)
+        self._last_id = 0
+        self._clients = 0
+        self._producer = None
+        self._run_start_id = 0
+        self.cursor = None
+
+    @property
+    def clients(self):
+        return self._clients
+
+    def subscribe(self, last_event_id=None):
+        """
+        Register a subscriber.
+
+        Returns:
+            An iterable of encoded SSE chunks, or None when the connection limit is reached
+        """
+        with self._cond:
+            if self._clients >= self.max_clients:
+                return None
+            self._clients += 1
+            if self._producer is None:
+                self.cursor = None
+                self._run_start_id = self._last_id
+                self._producer = threading.Thread(target=self._run, name='metrics-stream-producer', daemon=True)
+                self._producer.start()
+
+        return _Subscription(self, _parse_event_id(last_event_id))
+
+    def publish(self, payload):
+        """Serialize payload once and wake every subscriber."""
+        data = json.dumps(payload, separators=(',', ':'))
+        with self._cond:
+            # Millisecond ids stay increasing across restarts, so stale Last-Event-IDs are detectable
+            event_id = max(self._last_id + 1, int(time.time() * 1000))
+            chunk = f"id: {event_id}\nevent: {self.event}\ndata: {data}\n\n".encode()
+            self._events.append((event_id, chunk))
+            self._last_id = event_id
+            self._cond.notify_all()
+        return event_id
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._clients == 0:
+                    self._producer = None
+                    return
+
+            try:
+                payload = self.produce()
+            except Exception as e:
+                logger.error(f"Metrics stream producer failed: {e}")
+                payload = None
+            if payload is not None:
+                self.publish(payload)
+
+            time.sleep(self.interval)
+
+    def _release(self):
+        with self._cond:
+            self._clients -= 1
+
+    def _events_after(self, cursor):
+        """Return buffered events newer than cursor (caller holds the condition)."""
+        return [(event_id, chunk) for event_id, chunk in self._events if event_id > cursor]
+
+    def _start_cursor(self, last_event_id):
+        """Pick where a new subscriber starts reading (caller holds the condition)."""
+        oldest = self._events[0][0] if self._events else None
+        if last_event_id is not None and oldest is not None and oldest - 1 <= last_event_id <= self._last_id:
+            # Resume: replay whatever the client missed
+            return last_event_id
+        # Fresh or unresumable client: start with the latest snapshot
+        return max(self._events[-1][0] - 1, self._run_start_id) if self._events else self._last_id
+
+
+class _Subscription:
+    """Iterable SSE response body that releases its connection slot exactly once."""
+
+    def __init__(self, broadcaster, last_event_id):
+        self._broadcaster = broadcaster
+        self._gen = self._stream(last_event_id)
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._gen)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._gen.close()
+            self._broadcaster._release()
+
+    def _stream(self, last_event_id):
+        broadcaster = self._broadcaster
+        yield f"retry: {int(broadcaster.interval * 1000)}\n\n".encode()
+
+        with broadcaster._cond:
+            cursor = broadcaster._start_cursor(last_event_id)
+
+        while True:
+            with broadcaster._cond:
+                pending = broadcaster._events_after(cursor)
+                if not pending:
+                    broadcaster._cond.wait(timeout=broadcaster.heartbeat)
+                    pending = broadcaster._events_after(cursor)
+
+            if not pending:
+                yield b": keepalive\n\n"
+                continue
+            for event_id, chunk in pending:
+                cursor = event_id
+                yield chunk
+
+
+def _parse_event_id(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
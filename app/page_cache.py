@@ -0,0 +1,98 @@
+"""
+Page Cache - Render template-only pages once and answer repeats from memory
+
+Features:
+- Rendered bytes stored per path with a strong ETag; If-None-Match gets a 304
+- Pre-gzipped body served to clients that accept it
+- Cache hits return before the view runs, so no template rendering at all
+- Dev mode (debug or TEMPLATES_AUTO_RELOAD): entries are re-rendered once any
+  file under the template folder changes
+
+Usage:
+    page_cache = PageCache()
+
+    @main_bp.route('/journey')
+    @page_cache.cached
+    def journey():
+        return render_template('journey.html')
+"""
+
+import functools
+import gzip
+import hashlib
+import os
+
+from flask import current_app, make_response, request
+
+
+class PageCache:
+    """
+    In-process cache of rendered pages keyed by request path.
+
+    Pages are stored per application (in app.extensions), so apps built with
+    different settings never share rendered output.
+    """
+
+    def __init__(self, name='page_cache'):
+        self.name = name
+
+    def cached(self, view):
+        """Decorator caching a view's 200 responses; the view must not depend on the request."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version = _templates_version()
+            page = self._pages().get(request.path)
+            if page is None or page['version'] != version:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                # Concurrent misses may render twice; the last one wins, both are identical
+                page = self._store(request.path, response, version)
+            return _respond(page)
+        return wrapper
+
+    def clear(self):
+        self._pages().clear()
+
+    def _pages(self):
+        # path -> {'body', 'gzip', 'etag', 'mimetype', 'version'}
+        return current_app.extensions.setdefault(self.name, {})
+
+    def _store(self, path, response, version):
+        body = response.get_data()
+        page = {
+            'body': body,
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+            'etag': hashlib.sha256(body).hexdigest()[:20],
+            'mimetype': response.mimetype,
+            'version': version,
+        }
+        self._pages()[path] = page
+        return page
+
+
+def _respond(page):
+    use_gzip = bool(request.accept_encodings['gzip'])
+    response = current_app.response_class(page['gzip'] if use_gzip else page['body'], mimetype=page['mimetype'])
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Browsers revalidate on every visit, so a deploy shows up immediately
+    response.headers['Cache-Control'] = 'no-cache'
+    # Each encoding is a different byte sequence, so it gets its own strong ETag
+    response.set_etag(f"{page['etag']}-gzip" if use_gzip else page['etag'])
+    return response.make_conditional(request)
+
+
+def _templates_version():
+    """Latest template mtime in dev mode; constant in production where templates never change."""
+    app = current_app
+    if not (app.debug or app.config.get('TEMPLATES_AUTO_RELOAD')):
+        return None
+
+    folder = os.path.join(app.root_path, app.template_folder)
+    latest = 0.0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
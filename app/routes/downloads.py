@@ -0,0 +1,90 @@
+"""
+Downloads - Resumable PDF downloads that keep worker threads free
+
+Features:
+- HTTP Range and If-Range (partial and resumed loads used by PDF viewers),
+  ETag/Last-Modified revalidation
+- Zero-copy transfer: full downloads go out through the server's wsgi.file_wrapper,
+  which gunicorn sends with sendfile(2)
+- Reverse-proxy offload (DOWNLOAD_OFFLOAD): 'x-accel' answers with an empty
+  X-Accel-Redirect response for nginx, 'x-sendfile' with X-Sendfile for
+  Apache/lighttpd; the proxy then streams the file and handles ranges itself
+- Per-file Prometheus metrics for downloads and bytes served
+
+Environment:
+    DOWNLOAD_OFFLOAD: '', 'x-accel' or 'x-sendfile' (default: '', the app sends the file)
+    DOWNLOAD_ACCEL_PREFIX: nginx internal location mapped to app/static (default: /protected/)
+"""
+
+import mimetypes
+import os
+
+from flask import Blueprint, Response, abort, current_app, request
+from prometheus_client import Counter
+from werkzeug.utils import send_file
+
+from telemetry_middleware import registry
+
+
+downloads_bp = Blueprint('downloads', __name__)
+
+# Public download name -> path under the static folder
+DOWNLOADS = {
+    'FablihaFaiza.pdf': 'resume/FablihaFaiza.pdf',
+    'CKAD_Study_Guide.pdf': 'blog/CKAD_Study_Guide.pdf',
+}
+
+DOWNLOAD_MAX_AGE = 3600
+
+file_downloads_total = Counter(
+    'file_downloads_total',
+    'File download responses by file, status and transfer mode',
+    ['file', 'status_code', 'mode'],
+    registry=registry
+)
+
+file_download_bytes_total = Counter(
+    'file_download_bytes_total',
+    'Body bytes committed to file download responses sent by the app',
+    ['file'],
+    registry=registry
+)
+
+
+def _offload_mode():
+    return os.getenv('DOWNLOAD_OFFLOAD', '').lower()
+
+
+@downloads_bp.route('/downloads/<name>')
+def download(name):
+    relative = DOWNLOADS.get(name)
+    if relative is None:
+        abort(404)
+
+    mode = _offload_mode()
+    if mode == 'x-accel':
+        prefix = os.getenv('DOWNLOAD_ACCEL_PREFIX', '/protected/')
+        response = Response(mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative
+        response.headers['Content-Disposition'] = f'inline; filename="{name}"'
+        file_downloads_total.labels(file=name, status_code='200', mode=mode).inc()
+        return response
+
+    path = os.path.join(current_app.static_folder, relative)
+    # Range/If-Range are answered by werkzeug; X-Sendfile leaves the body to the proxy
+    response = send_file(
+        path,
+        request.environ,
+        download_name=name,
+        conditional=True,
+        max_age=DOWNLOAD_MAX_AGE,
+        use_x_sendfile=mode == 'x-sendfile',
+        response_class=current_app.response_class,
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+
+    file_downloads_total.labels(file=name, status_code=str(response.status_code), mode=mode or 'app').inc()
+    if mode != 'x-sendfile' and request.method != 'HEAD' and response.content_length:
+        # Counted when the response is committed; zero-copy sends cannot be observed per chunk
+        file_download_bytes_total.labels(file=name).inc(response.content_length)
+    return response
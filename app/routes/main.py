@@ -1,57 +1,76 @@
-# import requests
-import requests
+import os
+
 from flask import Blueprint, render_template
 
+from app import http_client
+from app.page_cache import PageCache
+from app.weather_cache import WeatherCache
+from telemetry_middleware import phase
+
 
 main_bp = Blueprint('main', __name__)
 
-@main_bp.route('/')
-def base():
+WEATHER_URL = os.getenv(
+    'WEATHER_URL',
+    "http://api.weatherapi.com/v1/current.json?key=3ca3bfa286b842afb4242203252304&q=San Francisco&aqi=no"
+)
+
 
-    response = requests.get(
-        "http://api.weatherapi.com/v1/current.json?key=3ca3bfa286b842afb4242203252304&q=San Francisco&aqi=no")
+def fetch_weather():
+    """Fetch current weather from weatherapi.com"""
+    response = http_client.get('weatherapi', WEATHER_URL)
+    response.raise_for_status()
     data = response.json()
-    weather = {
+    return {
         "location": data['location']['name'],
         "temp": data['current']['temp_c'],
         "condition": data['current']['condition']['text'],
         "icon": data['current']['condition']['icon'],
     }
 
+
+# Shared across requests; refreshed in the background once stale
+weather_cache = WeatherCache(fetch_weather)
+
+# Template-only pages: rendered once, then served from memory with ETag/304
+page_cache = PageCache()
+
+
+@main_bp.route('/')
+def base():
+    with phase('weather'):
+        weather = weather_cache.get()
+
     return render_template('base.html', weather=weather)
 @main_bp.route('/journey')
+@page_cache.cached
 def journey():
-    print("🔁 / journey route called")
-
     return render_template('journey.html')
 
 @main_bp.route('/portfolio')
+@page_cache.cached
 def portfolio():
-    print("🔁 / port route called")
-
     return render_template('portfolio.html')
 
 @main_bp.route('/certifications')
+@page_cache.cached
 def certifications():
-    print("🔁 / cert route called")
-
     return render_template('certifications.html')
 
 
 
 @main_bp.route('/contact')
+@page_cache.cached
 def contact():
-    print("🔁 / contac route called")
-
     return render_template('contact.html')
 
 @main_bp.route('/monitoring')
+@page_cache.cached
 def monitoring():
-    print("🔁 / monitoring route called")
-
     return render_template('monitoring.html')
 
 @main_bp.route('/blog/ckad')
+@page_cache.cached
 def blog_ckad():
     return render_template('blog_ckad.html')
 
@@ -1,218 +1,703 @@
 """
 Metrics API - Fetch live metrics from Prometheus
 Provides endpoints for live monitoring data to display in portfolio
+Request metrics can also be answered from the in-process store (see METRICS_SOURCE)
 """
 
-import requests
-from flask import Blueprint, jsonify
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from flask import Blueprint, Response, jsonify, request
+from prometheus_client import Counter, Histogram
 import logging
 
+from app import http_client
+from app.circuit_breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+from app.metrics_stream import MetricsBroadcaster
+from app.timeseries import SeriesWindow, downsample_series, to_columnar
+from metrics_store import local_metrics
+from telemetry_middleware import phase, registry
+
 logger = logging.getLogger(__name__)
 
 metrics_api_bp = Blueprint('metrics_api', __name__)
 
-# Prometheus URL (localhost since this runs on the Pi)
-PROMETHEUS_URL = 'http://localhost:9090/api/v1/query'
+# Prometheus URL (localhost since this runs on the Pi; PROMETHEUS_BASE_URL points elsewhere, e.g. a benchmark stub)
+PROMETHEUS_BASE_URL = os.getenv('PROMETHEUS_BASE_URL', 'http://localhost:9090').rstrip('/')
+PROMETHEUS_URL = f'{PROMETHEUS_BASE_URL}/api/v1/query'
+PROMETHEUS_RANGE_URL = f'{PROMETHEUS_BASE_URL}/api/v1/query_range'
+
+# Identical queries within the TTL are answered from memory, however many viewers poll
+QUERY_CACHE_TTL = float(os.getenv('PROMETHEUS_CACHE_TTL', 15))
+QUERY_CACHE_SIZE = int(os.getenv('PROMETHEUS_CACHE_SIZE', 256))
+
+# Queries for one endpoint run concurrently on a bounded pool and share one deadline
+QUERY_WORKERS = int(os.getenv('PROMETHEUS_QUERY_WORKERS', 8))
+ENDPOINT_DEADLINE = float(os.getenv('PROMETHEUS_ENDPOINT_DEADLINE', 5))
+# (connect, read) per call, capped at the deadline: an answer arriving later is
+# discarded anyway, and the call would keep holding a query pool thread
+QUERY_TIMEOUT = (1, min(5, ENDPOINT_DEADLINE))
+RANGE_QUERY_TIMEOUT = (1, min(10, ENDPOINT_DEADLINE))
+
+# Consecutive dashboard loads stop waiting on timeouts once Prometheus is failing
+BREAKER_THRESHOLD = float(os.getenv('PROMETHEUS_BREAKER_THRESHOLD', 0.5))
+BREAKER_MIN_CALLS = int(os.getenv('PROMETHEUS_BREAKER_MIN_CALLS', 5))
+BREAKER_COOLDOWN = float(os.getenv('PROMETHEUS_BREAKER_COOLDOWN', 30))
+
+_query_pool = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix='prometheus-query')
+
+# Scrape jobs whose targets the dashboard reports as up or down
+UPTIME_JOBS = ('pra_app', 'portfolio_app')
+
+LIVE_QUERIES = {
+    # 1. Request Rate (requests per second)
+    'request_rate': 'sum(rate(http_requests_total[5m])) by (app)',
+    # 2. Response Time (95th percentile in milliseconds)
+    'response_time_p95': '''
+            histogram_quantile(0.95,
+              sum(rate(http_request_duration_seconds_bucket[5m])) by (app, le)
+            ) * 1000
+        ''',
+    # 3. Error Rate (percentage)
+    'error_rate': '''
+            (sum(rate(http_requests_total{status_code=~"5.."}[5m])) by (app) /
+             sum(rate(http_requests_total[5m])) by (app)) * 100
+        ''',
+    # 4. Total Requests (last 24 hours)
+    'total_requests_24h': 'sum(increase(http_requests_total[24h])) by (app)',
+    # 5. Uptime (service up/down)
+    'uptime': 'up{job=~"%s"}' % '|'.join(UPTIME_JOBS),
+}
+
+SYSTEM_QUERIES = {
+    # CPU usage (percentage)
+    'cpu_usage': '100 - (avg by (instance) (rate(node_cpu_seconds_total{mode="idle"}[5m])) * 100)',
+    # Memory usage (percentage)
+    'memory_usage': '100 * (1 - (node_memory_MemAvailable_bytes / node_memory_MemTotal_bytes))',
+    # Disk usage (percentage)
+    'disk_usage': '100 - ((node_filesystem_avail_bytes{mountpoint="/"} / node_filesystem_size_bytes{mountpoint="/"}) * 100)',
+}
+
+TIMESERIES_QUERIES = {
+    # Request rate over time (5-minute intervals)
+    'request_rate_series': 'sum(rate(http_requests_total[5m])) by (app)',
+    # Response time over time
+    'response_time_series': 'histogram_quantile(0.95, sum(rate(http_request_duration_seconds_bucket[5m])) by (app, le)) * 1000',
+}
+TIMESERIES_STEP = 300
+TIMESERIES_MAX_WINDOW = 7 * 24 * 3600
+WINDOW_UNITS = {'m': 60, 'h': 3600, 'd': 86400}
+
+DEFAULT_OPTIONS = {
+    'window': 6 * 3600,
+    'max_points': None,
+    'format': 'prometheus',
+    'since': None,
+}
+
+# Rolling time-series windows, one per (query, window), extended incrementally
+SERIES_WINDOW_LIMIT = 16
+
+# Where request metrics come from: 'fallback' (Prometheus, then the in-process
+# store for queries that fail), 'local' (in-process store only) or 'prometheus'.
+# Each process only sees its own traffic since it started, so 'local' suits a
+# single long-lived process, not several gunicorn workers that get recycled.
+METRICS_SOURCE = os.getenv('METRICS_SOURCE', 'fallback')
+LOCAL_RATE_WINDOW = 300
+LOCAL_TOTAL_WINDOW = 24 * 3600
+
+# Top 10 countries by request count (last 24h)
+GEO_TOP_N = 10
+GEO_QUERY = f'topk({GEO_TOP_N}, sum(increase(http_requests_total[24h])) by (country))'
+
+prometheus_query_cache_total = Counter(
+    'prometheus_query_cache_total',
+    'Prometheus query cache lookups by result (hit, miss, coalesced)',
+    ['result'],
+    registry=registry
+)
+
+prometheus_query_duration_seconds = Histogram(
+    'prometheus_query_duration_seconds',
+    'Upstream Prometheus query latency in seconds',
+    ['endpoint'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+    registry=registry
+)
+
+
+class QueryCache:
+    """
+    TTL + LRU cache for Prometheus responses with single-flight loading.
+
+    Concurrent lookups of the same key wait on one upstream call instead of
+    each issuing their own. Failed loads (None) are not cached.
 
+    Args:
+        ttl: Seconds a successful response stays fresh
+        max_entries: Maximum number of cached responses before LRU eviction
+    """
 
-def query_prometheus(query):
-    """Query Prometheus and return results"""
+    def __init__(self, ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> _Flight
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader at most once per miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                prometheus_query_cache_total.labels(result='hit').inc()
+                return entry[1]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                prometheus_query_cache_total.labels(result='miss').inc()
+            else:
+                prometheus_query_cache_total.labels(result='coalesced').inc()
+
+        if not leader:
+            flight.done.wait()
+            return flight.value
+
+        value = None
+        try:
+            value = loader()
+        finally:
+            with self._lock:
+                if value is not None and self.ttl > 0:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                del self._inflight[key]
+            flight.value = value
+            flight.done.set()
+
+        return value
+
+    def get_stale(self, key):
+        """Return the last response for key even if expired, marked stale, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        prometheus_query_cache_total.labels(result='stale').inc()
+        return dict(entry[1], stale=True)
+
+    def clear(self):
+        """Drop all cached responses."""
+        with self._lock:
+            self._entries.clear()
+
+
+class _Flight:
+    """An upstream call that concurrent lookups of the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+_query_cache = QueryCache()
+
+prometheus_breaker = CircuitBreaker(
+    'prometheus',
+    threshold=BREAKER_THRESHOLD,
+    min_calls=BREAKER_MIN_CALLS,
+    cooldown=BREAKER_COOLDOWN
+)
+
+_series_windows = OrderedDict()
+_series_windows_lock = threading.Lock()
+
+
+def _get_json(url, params, timeout, endpoint):
+    """
+    GET a Prometheus API endpoint through the circuit breaker, recording upstream latency
+
+    Raises:
+        CircuitOpenError: Without calling Prometheus while the circuit is open
+    """
+    ticket = prometheus_breaker.allow()
+    if not ticket:
+        raise CircuitOpenError(prometheus_breaker.name)
+
+    started = time.perf_counter()
     try:
-        response = requests.get(PROMETHEUS_URL, params={'query': query}, timeout=5)
-        response.raise_for_status()
-        return response.json()
+        response = http_client.get('prometheus', url, params=params, timeout=timeout)
+    except Exception:
+        prometheus_breaker.record_failure(ticket)
+        raise
+    finally:
+        prometheus_query_duration_seconds.labels(endpoint=endpoint).observe(time.perf_counter() - started)
+
+    # A 4xx is a bad query, not an unavailable Prometheus
+    if response.status_code >= 500:
+        prometheus_breaker.record_failure(ticket)
+    else:
+        prometheus_breaker.record_success(ticket)
+    response.raise_for_status()
+    return response.json()
+
+
+def _cached_get(url, params, timeout, endpoint):
+    """Cached Prometheus GET; falls back to the last cached response, marked stale"""
+    key = (url, tuple(params.items()))
+    try:
+        value = _query_cache.get_or_load(key, lambda: _get_json(url, params, timeout, endpoint))
+    except CircuitOpenError:
+        value = None
     except Exception as e:
-        logger.error(f"Prometheus query failed: {e}")
-        return None
+        logger.error(f"Prometheus {endpoint} failed: {e}")
+        value = None
+    return value if value is not None else _query_cache.get_stale(key)
 
 
-@metrics_api_bp.route('/api/metrics/live')
-def get_live_metrics():
+def query_prometheus(query):
+    """Query Prometheus and return results"""
+    return _cached_get(PROMETHEUS_URL, {'query': query}, QUERY_TIMEOUT, 'query')
+
+
+def query_prometheus_range(query, start, end, step):
+    """Run a Prometheus range query and return results"""
+    params = {'query': query, 'start': start, 'end': end, 'step': step}
+    return _cached_get(PROMETHEUS_RANGE_URL, params, RANGE_QUERY_TIMEOUT, 'query_range')
+
+
+def run_concurrently(calls, deadline=None):
     """
-    Get live metrics for both apps (PRA and Portfolio)
-    Returns: Request rate, response time, error rate, uptime
+    Run several Prometheus calls concurrently on the shared query pool.
+
+    Args:
+        calls: Mapping of result key to a zero-argument callable returning a Prometheus response
+        deadline: Seconds to wait for all calls (default: ENDPOINT_DEADLINE)
+
+    Returns:
+        (results, missing): results maps each key to its successful response
+        or None; missing lists the keys that failed or missed the deadline
     """
-    try:
-        metrics = {}
-
-        # 1. Request Rate (requests per second)
-        req_rate_query = 'sum(rate(http_requests_total[5m])) by (app)'
-        req_rate_data = query_prometheus(req_rate_query)
-        if req_rate_data and req_rate_data.get('status') == 'success':
-            metrics['request_rate'] = [
-                {
-                    'app': result['metric']['app'],
-                    'value': float(result['value'][1])
-                }
-                for result in req_rate_data['data']['result']
-            ]
-        else:
-            metrics['request_rate'] = []
+    if deadline is None:
+        deadline = ENDPOINT_DEADLINE
 
-        # 2. Response Time (95th percentile in milliseconds)
-        resp_time_query = '''
-            histogram_quantile(0.95,
-              sum(rate(http_request_duration_seconds_bucket[5m])) by (app, le)
-            ) * 1000
-        '''
-        resp_time_data = query_prometheus(resp_time_query)
-        if resp_time_data and resp_time_data.get('status') == 'success':
-            metrics['response_time_p95'] = [
-                {
-                    'app': result['metric']['app'],
-                    'value': float(result['value'][1])
-                }
-                for result in resp_time_data['data']['result']
-            ]
-        else:
-            metrics['response_time_p95'] = []
+    futures = {key: _query_pool.submit(call) for key, call in calls.items()}
+    done, _ = wait(futures.values(), timeout=deadline)
 
-        # 3. Error Rate (percentage)
-        error_rate_query = '''
-            (sum(rate(http_requests_total{status_code=~"5.."}[5m])) by (app) /
-             sum(rate(http_requests_total[5m])) by (app)) * 100
-        '''
-        error_rate_data = query_prometheus(error_rate_query)
-        if error_rate_data and error_rate_data.get('status') == 'success':
-            metrics['error_rate'] = [
-                {
-                    'app': result['metric']['app'],
-                    'value': float(result['value'][1])
-                }
-                for result in error_rate_data['data']['result']
-            ]
-        else:
-            metrics['error_rate'] = []
-
-        # 4. Total Requests (last 24 hours)
-        total_requests_query = 'sum(increase(http_requests_total[24h])) by (app)'
-        total_data = query_prometheus(total_requests_query)
-        if total_data and total_data.get('status') == 'success':
-            metrics['total_requests_24h'] = [
-                {
-                    'app': result['metric']['app'],
-                    'value': int(float(result['value'][1]))
-                }
-                for result in total_data['data']['result']
-            ]
+    results = {}
+    missing = []
+    for key, future in futures.items():
+        if future in done:
+            data = future.result()
         else:
-            metrics['total_requests_24h'] = []
-
-        # 5. Uptime (service up/down)
-        uptime_query = 'up{job=~"pra_app|portfolio_app"}'
-        uptime_data = query_prometheus(uptime_query)
-        if uptime_data and uptime_data.get('status') == 'success':
-            metrics['uptime'] = [
-                {
-                    'app': result['metric'].get('app', 'unknown'),
-                    'job': result['metric']['job'],
-                    'status': 'up' if result['value'][1] == '1' else 'down'
-                }
-                for result in uptime_data['data']['result']
-            ]
+            future.cancel()
+            data = None
+            logger.warning(f"Prometheus query {key} missed the {deadline}s deadline")
+        if data and data.get('status') == 'success':
+            results[key] = data
         else:
-            metrics['uptime'] = []
+            results[key] = None
+            missing.append(key)
 
-        return jsonify({
-            'status': 'success',
-            'data': metrics,
-            'timestamp': req_rate_data['data'].get('resultType') if req_rate_data else None
-        })
+    return results, missing
 
-    except Exception as e:
-        logger.error(f"Failed to fetch metrics: {e}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
 
+def query_prometheus_many(queries, deadline=None):
+    """Run several instant queries concurrently (see run_concurrently)"""
+    return run_concurrently(
+        {name: partial(query_prometheus, query) for name, query in queries.items()},
+        deadline
+    )
 
-@metrics_api_bp.route('/api/metrics/timeseries')
-def get_timeseries_metrics():
-    """
-    Get time-series data for charts (last 6 hours)
-    Returns: Request rate and response time over time
+
+def _values_by_app(data, cast=float):
+    """Map an instant-vector result to [{'app': ..., 'value': ...}]"""
+    if not data:
+        return []
+    return [
+        {
+            'app': result['metric']['app'],
+            'value': cast(float(result['value'][1]))
+        }
+        for result in data['data']['result']
+    ]
+
+
+def _first_value(data):
+    """Return the first sample of an instant-vector result, or 0"""
+    if not data or not data['data']['result']:
+        return 0
+    return float(data['data']['result'][0]['value'][1])
+
+
+# Each dashboard section is a set of upstream calls plus a builder for its payload
+
+def _live_calls(options):
+    return {name: partial(query_prometheus, query) for name, query in LIVE_QUERIES.items()}
+
+
+def _build_live(results, options):
+    metrics = {
+        'request_rate': _values_by_app(results['request_rate']),
+        'response_time_p95': _values_by_app(results['response_time_p95']),
+        'error_rate': _values_by_app(results['error_rate']),
+        'total_requests_24h': _values_by_app(results['total_requests_24h'], cast=int),
+    }
+
+    uptime_data = results['uptime']
+    metrics['uptime'] = [
+        {
+            'app': result['metric'].get('app') or result['metric']['job'].removesuffix('_app'),
+            'job': result['metric']['job'],
+            'status': UPTIME_STATUS.get(result['value'][1], 'unknown')
+        }
+        for result in uptime_data['data']['result']
+    ] if uptime_data else []
+
+    return metrics
+
+
+UPTIME_STATUS = {'1': 'up', '0': 'down'}
+
+
+def _series_window(query, window):
+    """Return the shared rolling window for a query, evicting the least recently used"""
+    key = (query, window)
+    with _series_windows_lock:
+        series_window = _series_windows.get(key)
+        if series_window is None:
+            series_window = _series_windows[key] = SeriesWindow(window, TIMESERIES_STEP)
+        _series_windows.move_to_end(key)
+        while len(_series_windows) > SERIES_WINDOW_LIMIT:
+            _series_windows.popitem(last=False)
+    return series_window
+
+
+def query_series_window(query, window, end, since=None):
     """
-    try:
-        # Use range query for time-series data
-        PROMETHEUS_RANGE_URL = 'http://localhost:9090/api/v1/query_range'
+    Extend the rolling window for a range query up to end and return it.
 
-        metrics = {}
+    Only the steps added since the last refresh are fetched from Prometheus.
+    The response mirrors a range query, plus the window 'end' for use as a cursor.
+    When the refresh fails, the window as last fetched is returned, marked stale.
+    """
+    def fetch(start, stop):
+        data = query_prometheus_range(query, start, stop, TIMESERIES_STEP)
+        ok = data and data.get('status') == 'success' and not data.get('stale')
+        return data['data']['result'] if ok else None
+
+    series_window = _series_window(query, window)
+    stale = not series_window.refresh(fetch, end)
+    if stale and series_window.end is None:
+        return None
 
-        # Request rate over time (5-minute intervals)
-        req_rate_params = {
-            'query': 'sum(rate(http_requests_total[5m])) by (app)',
-            'start': 'now-6h',
-            'end': 'now',
-            'step': '5m'
+    response = {
+        'status': 'success',
+        'data': {
+            'resultType': 'matrix',
+            'result': series_window.series(since),
+            'end': series_window.end
         }
-        req_rate_data = requests.get(PROMETHEUS_RANGE_URL, params=req_rate_params, timeout=10)
-        if req_rate_data.status_code == 200:
-            metrics['request_rate_series'] = req_rate_data.json()['data']['result']
-        else:
-            metrics['request_rate_series'] = []
-
-        # Response time over time
-        resp_time_params = {
-            'query': 'histogram_quantile(0.95, sum(rate(http_request_duration_seconds_bucket[5m])) by (app, le)) * 1000',
-            'start': 'now-6h',
-            'end': 'now',
-            'step': '5m'
+    }
+    if stale:
+        response['stale'] = True
+    return response
+
+
+def _timeseries_calls(options):
+    # Align the window to the step so every viewer shares the same cache key
+    end = int(time.time() // TIMESERIES_STEP * TIMESERIES_STEP)
+    return {
+        name: partial(query_series_window, query, options['window'], end, options['since'])
+        for name, query in TIMESERIES_QUERIES.items()
+    }
+
+
+def _build_timeseries(results, options):
+    metrics = {}
+    cursor = None
+    for name, data in results.items():
+        if data:
+            cursor = max(cursor or 0, data['data']['end'])
+        series = downsample_series(data['data']['result'] if data else [], options['max_points'])
+        metrics[name] = to_columnar(series) if options['format'] == 'columnar' else series
+
+    # Clients pass cursor back as since= to receive only newer points
+    metrics['cursor'] = cursor if cursor is not None else options['since']
+    metrics['since'] = options['since']
+    metrics['incremental'] = options['since'] is not None
+    return metrics
+
+
+def _geographic_calls(options):
+    return {'countries': partial(query_prometheus, GEO_QUERY)}
+
+
+def _build_geographic(results, options):
+    geo_data = results['countries']
+    if not geo_data:
+        return []
+    countries = []
+    for result in geo_data['data']['result']:
+        country = {
+            'country': result['metric'].get('country', 'Unknown'),
+            'requests': int(float(result['value'][1]))
         }
-        resp_time_data = requests.get(PROMETHEUS_RANGE_URL, params=resp_time_params, timeout=10)
-        if resp_time_data.status_code == 200:
-            metrics['response_time_series'] = resp_time_data.json()['data']['result']
-        else:
-            metrics['response_time_series'] = []
+        # Local top-k counts are upper bounds; the true count is at least requests - error
+        if 'error' in result:
+            country['error'] = result['error']
+        countries.append(country)
+    return countries
+
+
+def _system_calls(options):
+    return {name: partial(query_prometheus, query) for name, query in SYSTEM_QUERIES.items()}
+
+
+def _build_system(results, options):
+    return {name: _first_value(data) for name, data in results.items()}
+
+
+# Local answers mirror Prometheus responses, so the section builders need no changes
+
+def _local_vector(value, **labels):
+    result = []
+    if value is not None:
+        result.append({'metric': dict({'app': local_metrics.app or 'local'}, **labels), 'value': [time.time(), str(value)]})
+    return {'status': 'success', 'data': {'resultType': 'vector', 'result': result}}
+
+
+def _local_summary_value(field, window=LOCAL_RATE_WINDOW):
+    return lambda options: _local_vector(local_metrics.summary(window)[field])
+
+
+def _local_series(column):
+    def answer(options):
+        points = local_metrics.series(options['window'])
+        since = options['since']
+        values = [
+            [ts, str(point[column])] for ts, *point in points
+            if point[column] is not None and (since is None or ts > since)
+        ]
+        result = [{'metric': {'app': local_metrics.app or 'local'}, 'values': values}] if values else []
+        end = points[-1][0] if points else int(time.time() // TIMESERIES_STEP * TIMESERIES_STEP)
+        return {'status': 'success', 'data': {'resultType': 'matrix', 'result': result, 'end': end}}
+    return answer
+
+
+def _local_countries(options):
+    entries, _ = local_metrics.shared_countries.top(GEO_TOP_N)
+    now = time.time()
+    result = [
+        {'metric': {'country': entry['item']}, 'value': [now, str(entry['count'])], 'error': entry['error']}
+        for entry in entries
+    ]
+    return {'status': 'success', 'data': {'resultType': 'vector', 'result': result}}
+
+
+def _local_uptime(options):
+    # Only Prometheus scrapes the targets: without it, their state is unknown
+    now = time.time()
+    result = [{'metric': {'job': job}, 'value': [now, 'NaN']} for job in UPTIME_JOBS]
+    return {'status': 'success', 'data': {'resultType': 'vector', 'result': result}}
+
+
+LOCAL_ANSWERS = {
+    ('live', 'request_rate'): _local_summary_value('request_rate'),
+    ('live', 'response_time_p95'): _local_summary_value('response_time_p95'),
+    ('live', 'error_rate'): _local_summary_value('error_rate'),
+    ('live', 'total_requests_24h'): _local_summary_value('requests', LOCAL_TOTAL_WINDOW),
+    ('live', 'uptime'): _local_uptime,
+    ('timeseries', 'request_rate_series'): _local_series(0),
+    ('timeseries', 'response_time_series'): _local_series(1),
+    ('geographic', 'countries'): _local_countries,
+}
+
+# Answered from the local store first (unless METRICS_SOURCE=prometheus), with
+# Prometheus only as the fallback when it has nothing yet: the top-k tracker
+# is merged across workers, and the 24h topk query scans every series
+LOCAL_FIRST = {('geographic', 'countries')}
+
+
+DASHBOARD_SECTIONS = {
+    'live': (_live_calls, _build_live),
+    'timeseries': (_timeseries_calls, _build_timeseries),
+    'geographic': (_geographic_calls, _build_geographic),
+    'system': (_system_calls, _build_system),
+}
 
+
+def parse_options(args):
+    """
+    Parse section options from query parameters.
+
+    Query:
+        window: Time-series window, e.g. 6h, 24h, 7d or seconds (default: 6h, max: 7d)
+        max_points: Downsample each series to at most this many points (LTTB, min 3)
+        since: Only return time-series points after this timestamp (a previous 'cursor')
+        format: 'prometheus' (default) or 'columnar'
+
+    Raises:
+        ValueError: On malformed or out-of-range values
+    """
+    options = dict(DEFAULT_OPTIONS)
+
+    window = args.get('window')
+    if window:
+        unit = window[-1]
+        seconds = int(window[:-1]) * WINDOW_UNITS[unit] if unit in WINDOW_UNITS else int(window)
+        if not TIMESERIES_STEP <= seconds <= TIMESERIES_MAX_WINDOW:
+            raise ValueError(f"window must be between {TIMESERIES_STEP}s and {TIMESERIES_MAX_WINDOW}s")
+        options['window'] = seconds
+
+    max_points = args.get('max_points') or args.get('points')
+    if max_points:
+        options['max_points'] = int(max_points)
+        if options['max_points'] < 3:
+            raise ValueError('max_points must be at least 3')
+
+    since = args.get('since')
+    if since:
+        options['since'] = float(since)
+
+    fmt = args.get('format')
+    if fmt:
+        if fmt not in ('prometheus', 'columnar'):
+            raise ValueError("format must be 'prometheus' or 'columnar'")
+        options['format'] = fmt
+
+    return options
+
+
+def fetch_sections(sections, options=None):
+    """
+    Build several dashboard sections from one concurrent fan-out.
+
+    Args:
+        sections: Names from DASHBOARD_SECTIONS
+        options: Parsed options (see parse_options); defaults when None
+
+    Returns:
+        (data, status): payload keyed by section, and status lists keyed by
+        'missing', 'local' (answered from the in-process store) and 'stale'
+        (served from the last good response), each then keyed by section
+    """
+    if options is None:
+        options = DEFAULT_OPTIONS
+
+    calls = {}
+    for section in sections:
+        make_calls, _ = DASHBOARD_SECTIONS[section]
+        for name, call in make_calls(options).items():
+            calls[(section, name)] = call
+
+    local_keys = []
+    answered = {}
+    if METRICS_SOURCE != 'prometheus':
+        local_keys = [key for key in calls if key in LOCAL_ANSWERS]
+        with phase('local_store'):
+            for key in local_keys:
+                if METRICS_SOURCE == 'local':
+                    del calls[key]
+                elif key in LOCAL_FIRST:
+                    answer = LOCAL_ANSWERS[key](options)
+                    if answer['data']['result']:
+                        answered[key] = answer
+                        del calls[key]
+
+    with phase('prometheus'):
+        results, missing_keys = run_concurrently(calls) if calls else ({}, [])
+
+    status = {field: {section: [] for section in sections} for field in ('missing', 'local', 'stale')}
+    with phase('local_store'):
+        for key in local_keys:
+            # Fresh local numbers beat stale Prometheus ones
+            if results.get(key) is None or results[key].get('stale'):
+                results[key] = answered.get(key) or LOCAL_ANSWERS[key](options)
+                status['local'][key[0]].append(key[1])
+                if key in missing_keys:
+                    missing_keys.remove(key)
+
+    for section, name in missing_keys:
+        status['missing'][section].append(name)
+    for (section, name), value in results.items():
+        if value and value.get('stale'):
+            status['stale'][section].append(name)
+
+    data = {}
+    for section in sections:
+        _, build = DASHBOARD_SECTIONS[section]
+        data[section] = build({name: value for (s, name), value in results.items() if s == section}, options)
+
+    return data, status
+
+
+def _section_response(section, error_message):
+    """Serve a single dashboard section as its own endpoint"""
+    try:
+        options = parse_options(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'error': str(e)
+        }), 400
+
+    try:
+        data, status = fetch_sections([section], options)
         return jsonify({
             'status': 'success',
-            'data': metrics
+            'data': data[section],
+            'missing': status['missing'][section],
+            'local': status['local'][section],
+            'stale': bool(status['stale'][section]),
+            'stale_queries': status['stale'][section]
         })
 
     except Exception as e:
-        logger.error(f"Failed to fetch time-series metrics: {e}")
+        logger.error(f"{error_message}: {e}")
         return jsonify({
             'status': 'error',
             'error': str(e)
         }), 500
 
 
+@metrics_api_bp.route('/api/metrics/live')
+def get_live_metrics():
+    """
+    Get live metrics for both apps (PRA and Portfolio)
+    Returns: Request rate, response time, error rate, uptime
+    """
+    return _section_response('live', 'Failed to fetch metrics')
+
+
+@metrics_api_bp.route('/api/metrics/timeseries')
+def get_timeseries_metrics():
+    """
+    Get time-series data for charts (last 6 hours by default)
+    Query: window=6h|24h|7d, max_points=<n> (LTTB downsampling), format=prometheus|columnar,
+           since=<cursor> (only points newer than a previous response's cursor)
+    Returns: Request rate and response time over time
+    """
+    return _section_response('timeseries', 'Failed to fetch time-series metrics')
+
+
 @metrics_api_bp.route('/api/metrics/geographic')
 def get_geographic_metrics():
     """
     Get geographic distribution of traffic
-    Returns: Top countries by request count
+    Returns: Top countries by request count over 24h, from the top-k tracker merged
+             across workers (each entry's 'error' bounds its overcount); Prometheus
+             answers only while the tracker is still empty
     """
-    try:
-        # Top 10 countries by request count (last 24h)
-        geo_query = 'topk(10, sum(increase(http_requests_total[24h])) by (country))'
-        geo_data = query_prometheus(geo_query)
-
-        if geo_data and geo_data.get('status') == 'success':
-            countries = [
-                {
-                    'country': result['metric'].get('country', 'Unknown'),
-                    'requests': int(float(result['value'][1]))
-                }
-                for result in geo_data['data']['result']
-            ]
-            return jsonify({
-                'status': 'success',
-                'data': countries
-            })
-        else:
-            return jsonify({
-                'status': 'success',
-                'data': []
-            })
-
-    except Exception as e:
-        logger.error(f"Failed to fetch geographic metrics: {e}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    return _section_response('geographic', 'Failed to fetch geographic metrics')
 
 
 @metrics_api_bp.route('/api/metrics/system')
@@ -221,67 +706,134 @@ def get_system_metrics():
     Get system metrics (CPU, Memory, Disk)
     Returns: Current system resource usage
     """
-    try:
-        metrics = {}
+    return _section_response('system', 'Failed to fetch system metrics')
 
-        # CPU usage (percentage)
-        cpu_query = '100 - (avg by (instance) (rate(node_cpu_seconds_total{mode="idle"}[5m])) * 100)'
-        cpu_data = query_prometheus(cpu_query)
-        if cpu_data and cpu_data.get('status') == 'success' and cpu_data['data']['result']:
-            metrics['cpu_usage'] = float(cpu_data['data']['result'][0]['value'][1])
-        else:
-            metrics['cpu_usage'] = 0
 
-        # Memory usage (percentage)
-        mem_query = '100 * (1 - (node_memory_MemAvailable_bytes / node_memory_MemTotal_bytes))'
-        mem_data = query_prometheus(mem_query)
-        if mem_data and mem_data.get('status') == 'success' and mem_data['data']['result']:
-            metrics['memory_usage'] = float(mem_data['data']['result'][0]['value'][1])
-        else:
-            metrics['memory_usage'] = 0
-
-        # Disk usage (percentage)
-        disk_query = '100 - ((node_filesystem_avail_bytes{mountpoint="/"} / node_filesystem_size_bytes{mountpoint="/"}) * 100)'
-        disk_data = query_prometheus(disk_query)
-        if disk_data and disk_data.get('status') == 'success' and disk_data['data']['result']:
-            metrics['disk_usage'] = float(disk_data['data']['result'][0]['value'][1])
-        else:
-            metrics['disk_usage'] = 0
+@metrics_api_bp.route('/api/metrics/dashboard')
+def get_dashboard_metrics():
+    """
+    Get every dashboard section in one response
+    Query: fields=live,timeseries,geographic,system (default: all),
+           plus the time-series options of /api/metrics/timeseries
+    Returns: Section payloads keyed by name, plus missing queries per section
+    """
+    fields = request.args.get('fields')
+    if fields:
+        sections = list(dict.fromkeys(f.strip() for f in fields.split(',') if f.strip()))
+    else:
+        sections = list(DASHBOARD_SECTIONS)
+
+    unknown = [section for section in sections if section not in DASHBOARD_SECTIONS]
+    if unknown or not sections:
+        return jsonify({
+            'status': 'error',
+            'error': f"Unknown fields: {', '.join(unknown) or '(none)'}; "
+                     f"expected any of {', '.join(DASHBOARD_SECTIONS)}"
+        }), 400
 
+    try:
+        options = parse_options(request.args)
+    except ValueError as e:
         return jsonify({
-            'status': 'success',
-            'data': metrics
-        })
+            'status': 'error',
+            'error': str(e)
+        }), 400
+
+    try:
+        data, status = fetch_sections(sections, options)
+        return jsonify(_dashboard_body(data, status))
 
     except Exception as e:
-        logger.error(f"Failed to fetch system metrics: {e}")
+        logger.error(f"Failed to fetch dashboard metrics: {e}")
         return jsonify({
             'status': 'error',
             'error': str(e)
         }), 500
 
 
+def _dashboard_body(data, status):
+    return {
+        'status': 'success',
+        'data': data,
+        'missing': status['missing'],
+        'local': status['local'],
+        'stale': any(status['stale'].values()),
+        'stale_queries': status['stale']
+    }
+
+
+# The monitoring page renders downsampled columnar series
+STREAM_OPTIONS = dict(DEFAULT_OPTIONS, max_points=300, format='columnar')
+
+
+def _dashboard_snapshot():
+    """
+    Build the dashboard payload for the metrics stream
+    Events carry only the time-series points added since the previous tick;
+    the first tick after the producer starts carries the full window
+    """
+    options = dict(STREAM_OPTIONS, since=metrics_broadcaster.cursor)
+    data, status = fetch_sections(list(DASHBOARD_SECTIONS), options)
+    metrics_broadcaster.cursor = data['timeseries']['cursor']
+    return _dashboard_body(data, status)
+
+
+# One producer per process feeds every connected dashboard
+metrics_broadcaster = MetricsBroadcaster(_dashboard_snapshot)
+
+
+@metrics_api_bp.route('/api/metrics/stream')
+def stream_metrics():
+    """
+    Stream dashboard snapshots as Server-Sent Events
+    Resumes from the Last-Event-ID header (or lastEventId query parameter)
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    stream = metrics_broadcaster.subscribe(last_event_id)
+
+    if stream is None:
+        return jsonify({
+            'status': 'error',
+            'error': 'Too many stream connections'
+        }), 503, {'Retry-After': str(int(metrics_broadcaster.interval))}
+
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@metrics_api_bp.route('/api/metrics/local')
+def get_local_metrics():
+    """
+    Get request metrics from this process's in-process store (no Prometheus)
+    Returns: Request count, rate, p95 latency and error rate over 5m, 1h and 24h
+    """
+    return jsonify({
+        'status': 'success',
+        'data': {
+            label: local_metrics.summary(seconds)
+            for label, seconds in (('5m', 300), ('1h', 3600), ('24h', 24 * 3600))
+        }
+    })
+
+
 @metrics_api_bp.route('/api/metrics/health')
 def health_check():
-    """Health check endpoint for the metrics API"""
-    try:
-        # Test Prometheus connectivity
-        test_query = 'up'
-        result = query_prometheus(test_query)
-
-        if result and result.get('status') == 'success':
-            return jsonify({
-                'status': 'healthy',
-                'prometheus': 'connected'
-            })
-        else:
-            return jsonify({
-                'status': 'degraded',
-                'prometheus': 'disconnected'
-            }), 503
-
-    except Exception as e:
+    """
+    Health check endpoint for the metrics API
+    Reports the Prometheus circuit breaker state; never queries Prometheus itself
+    """
+    circuit = prometheus_breaker.snapshot()
+    if circuit['state'] == CLOSED:
         return jsonify({
-            'status': 'unhealthy',
-            'error': str(e)
-        }), 503
+            'status': 'healthy',
+            'prometheus': 'connected',
+            'circuit': circuit
+        })
+
+    return jsonify({
+        'status': 'degraded',
+        'prometheus': 'disconnected' if circuit['state'] == OPEN else 'recovering',
+        'circuit': circuit
+    }), 503 if circuit['state'] == OPEN else 200
@@ -5,14 +5,62 @@ let requestRateChart = null;
 let responseTimeChart = null;
 let geoChart = null;
 
+let pollTimer = null;
+
+// Time-series points kept in the page and extended with incremental updates
+const TIMESERIES_WINDOW_SECONDS = 6 * 3600;
+const TIMESERIES_PARAMS = 'max_points=300&format=columnar';
+let timeseriesCursor = null;
+let seriesStore = {};
+let fullTimeseriesPending = false;
+
 // Initialize dashboard
 document.addEventListener('DOMContentLoaded', () => {
     initializeCharts();
+    startLiveUpdates();
+});
+
+// Prefer the server push stream, fall back to polling when it is unavailable
+function startLiveUpdates() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+
+    const source = new EventSource('/api/metrics/stream');
+    let failures = 0;
+
+    source.addEventListener('metrics', (event) => {
+        failures = 0;
+        const dashboard = JSON.parse(event.data);
+
+        if (dashboard.status === 'success') {
+            renderDashboard(dashboard.data);
+            document.getElementById('lastUpdate').textContent = new Date().toLocaleTimeString();
+        } else {
+            updateStatus('Error fetching data', false);
+        }
+    });
+
+    source.onerror = () => {
+        // The browser reconnects (resuming via Last-Event-ID) unless the server refused the stream
+        failures += 1;
+        if (source.readyState === EventSource.CLOSED || failures >= 3) {
+            source.close();
+            startPolling();
+        } else {
+            updateStatus('Reconnecting...', false);
+        }
+    };
+}
+
+function startPolling() {
+    if (pollTimer) return;
     fetchAndUpdateMetrics();
 
     // Auto-refresh every 30 seconds
-    setInterval(fetchAndUpdateMetrics, 30000);
-});
+    pollTimer = setInterval(fetchAndUpdateMetrics, 30000);
+}
 
 // Initialize Chart.js charts
 function initializeCharts() {
@@ -123,41 +171,17 @@ async function fetchAndUpdateMetrics() {
     try {
         updateStatus('Fetching data...', true);
 
-        // Fetch live metrics
-        const liveResponse = await fetch('/api/metrics/live');
-        const liveData = await liveResponse.json();
+        // One request for every section the page renders
+        const since = timeseriesCursor !== null ? `&since=${timeseriesCursor}` : '';
+        const response = await fetch(`/api/metrics/dashboard?fields=live,timeseries,geographic,system&${TIMESERIES_PARAMS}${since}`);
+        const dashboard = await response.json();
 
-        if (liveData.status === 'success') {
-            updateQuickStats(liveData.data);
-            updateAppStatus(liveData.data);
-            updateStatus('Live', true);
-        } else {
+        if (dashboard.status !== 'success') {
             updateStatus('Error fetching data', false);
+            return;
         }
 
-        // Fetch time-series data
-        const timeseriesResponse = await fetch('/api/metrics/timeseries');
-        const timeseriesData = await timeseriesResponse.json();
-
-        if (timeseriesData.status === 'success') {
-            updateCharts(timeseriesData.data);
-        }
-
-        // Fetch geographic data
-        const geoResponse = await fetch('/api/metrics/geographic');
-        const geoData = await geoResponse.json();
-
-        if (geoData.status === 'success') {
-            updateGeoChart(geoData.data);
-        }
-
-        // Fetch system metrics
-        const systemResponse = await fetch('/api/metrics/system');
-        const systemData = await systemResponse.json();
-
-        if (systemData.status === 'success') {
-            updateSystemMetrics(systemData.data);
-        }
+        renderDashboard(dashboard.data);
 
         // Update last update time
         document.getElementById('lastUpdate').textContent = new Date().toLocaleTimeString();
@@ -168,6 +192,27 @@ async function fetchAndUpdateMetrics() {
     }
 }
 
+// Render every section present in a dashboard payload
+function renderDashboard(data) {
+    if (data.live) {
+        updateQuickStats(data.live);
+        updateAppStatus(data.live);
+        updateStatus('Live', true);
+    }
+
+    if (data.timeseries) {
+        applyTimeseries(data.timeseries);
+    }
+
+    if (data.geographic) {
+        updateGeoChart(data.geographic);
+    }
+
+    if (data.system) {
+        updateSystemMetrics(data.system);
+    }
+}
+
 // Update quick stats cards
 function updateQuickStats(data) {
     // Total request rate
@@ -236,7 +281,7 @@ function updateAppStatus(data) {
     // Create cards for each app
     Object.values(apps).forEach(app => {
         const card = document.createElement('div');
-        card.className = `app-status-card ${app.status === 'down' ? 'down' : ''}`;
+        card.className = `app-status-card ${app.status !== 'up' ? app.status : ''}`;
 
         const displayName = app.name === 'skincares' ? 'PRA (skincares.work)' :
                            app.name === 'portfolio' ? 'Portfolio (fablihamaliha.us)' :
@@ -244,7 +289,7 @@ function updateAppStatus(data) {
 
         card.innerHTML = `
             <h3>${displayName}</h3>
-            <span class="app-status-badge ${app.status === 'down' ? 'down' : ''}">${app.status.toUpperCase()}</span>
+            <span class="app-status-badge ${app.status !== 'up' ? app.status : ''}">${app.status.toUpperCase()}</span>
             ${app.reqRate ? `
                 <div class="app-metric">
                     <span class="app-metric-label">Request Rate</span>
@@ -275,59 +320,109 @@ function updateAppStatus(data) {
     });
 }
 
-// Update time-series charts
-function updateCharts(data) {
-    // Update Request Rate Chart
-    if (data.request_rate_series && data.request_rate_series.length > 0) {
-        const datasets = data.request_rate_series.map((series, index) => {
-            const appName = series.metric.app;
-            const colors = [
-                { bg: 'rgba(102, 126, 234, 0.2)', border: 'rgba(102, 126, 234, 1)' },
-                { bg: 'rgba(118, 75, 162, 0.2)', border: 'rgba(118, 75, 162, 1)' }
-            ];
-            const color = colors[index % colors.length];
-
-            return {
-                label: appName,
-                data: series.values.map(v => ({ x: new Date(v[0] * 1000), y: parseFloat(v[1]) })),
-                backgroundColor: color.bg,
-                borderColor: color.border,
-                borderWidth: 2,
-                tension: 0.4,
-                fill: true
-            };
+// Merge a time-series section (full window or incremental delta) into the page's store
+function applyTimeseries(section) {
+    if (section.incremental) {
+        // A delta that starts after our cursor means we missed points
+        if (timeseriesCursor === null || section.since > timeseriesCursor) {
+            fetchFullTimeseries();
+            return;
+        }
+    } else {
+        seriesStore = {};
+    }
+
+    ['request_rate_series', 'response_time_series'].forEach(name => {
+        const store = seriesStore[name] = seriesStore[name] || {};
+        seriesPoints(section[name]).forEach(series => {
+            const key = JSON.stringify(series.metric);
+            const entry = store[key] = store[key] || { metric: series.metric, points: [] };
+            const last = entry.points.length ? entry.points[entry.points.length - 1].x : null;
+            entry.points.push(...series.points.filter(p => last === null || p.x > last));
         });
+    });
 
-        requestRateChart.data.datasets = datasets;
-        requestRateChart.update();
+    if (section.cursor !== null && section.cursor !== undefined) {
+        timeseriesCursor = Math.max(timeseriesCursor || 0, section.cursor);
+        const cutoff = new Date((timeseriesCursor - TIMESERIES_WINDOW_SECONDS) * 1000);
+        Object.values(seriesStore).forEach(store => Object.values(store).forEach(entry => {
+            entry.points = entry.points.filter(p => p.x >= cutoff);
+        }));
     }
 
-    // Update Response Time Chart
-    if (data.response_time_series && data.response_time_series.length > 0) {
-        const datasets = data.response_time_series.map((series, index) => {
-            const appName = series.metric.app;
-            const colors = [
-                { bg: 'rgba(72, 187, 120, 0.2)', border: 'rgba(72, 187, 120, 1)' },
-                { bg: 'rgba(245, 101, 101, 0.2)', border: 'rgba(245, 101, 101, 1)' }
-            ];
-            const color = colors[index % colors.length];
-
-            return {
-                label: appName,
-                data: series.values.map(v => ({ x: new Date(v[0] * 1000), y: parseFloat(v[1]) })),
-                backgroundColor: color.bg,
-                borderColor: color.border,
-                borderWidth: 2,
-                tension: 0.4,
-                fill: true
-            };
-        });
+    updateCharts();
+}
 
-        responseTimeChart.data.datasets = datasets;
-        responseTimeChart.update();
+async function fetchFullTimeseries() {
+    if (fullTimeseriesPending) return;
+    fullTimeseriesPending = true;
+
+    try {
+        const response = await fetch(`/api/metrics/timeseries?${TIMESERIES_PARAMS}`);
+        const timeseries = await response.json();
+
+        if (timeseries.status === 'success') {
+            applyTimeseries(timeseries.data);
+        }
+    } catch (error) {
+        console.error('Error fetching time-series:', error);
+    } finally {
+        fullTimeseriesPending = false;
     }
 }
 
+// Update time-series charts
+function updateCharts() {
+    updateSeriesChart(requestRateChart, Object.values(seriesStore.request_rate_series || {}), [
+        { bg: 'rgba(102, 126, 234, 0.2)', border: 'rgba(102, 126, 234, 1)' },
+        { bg: 'rgba(118, 75, 162, 0.2)', border: 'rgba(118, 75, 162, 1)' }
+    ]);
+
+    updateSeriesChart(responseTimeChart, Object.values(seriesStore.response_time_series || {}), [
+        { bg: 'rgba(72, 187, 120, 0.2)', border: 'rgba(72, 187, 120, 1)' },
+        { bg: 'rgba(245, 101, 101, 0.2)', border: 'rgba(245, 101, 101, 1)' }
+    ]);
+}
+
+// Convert a series payload (columnar or Prometheus matrix) into chart points per series
+function seriesPoints(payload) {
+    if (!payload) return [];
+
+    // Columnar: shared timestamps plus one float array per series
+    if (payload.timestamps) {
+        const times = payload.timestamps.map(ts => new Date(ts * 1000));
+        return payload.series.map(series => ({
+            metric: series.metric,
+            points: series.values.map((y, i) => ({ x: times[i], y: y }))
+        }));
+    }
+
+    return payload.map(series => ({
+        metric: series.metric,
+        points: series.values.map(v => ({ x: new Date(v[0] * 1000), y: parseFloat(v[1]) }))
+    }));
+}
+
+function updateSeriesChart(chart, series, colors) {
+    if (series.length === 0) return;
+
+    chart.data.datasets = series.map((item, index) => {
+        const color = colors[index % colors.length];
+
+        return {
+            label: item.metric.app,
+            data: item.points,
+            backgroundColor: color.bg,
+            borderColor: color.border,
+            borderWidth: 2,
+            tension: 0.4,
+            spanGaps: true,
+            fill: true
+        };
+    });
+    chart.update();
+}
+
 // Update geographic chart
 function updateGeoChart(data) {
     if (data && data.length > 0) {
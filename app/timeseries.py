@@ -0,0 +1,169 @@
+"""
+Time Series Helpers - Shrink Prometheus range results before they go over the wire
+
+Features:
+- Largest-Triangle-Three-Buckets (LTTB) downsampling, which keeps peaks and dips
+- Compact columnar encoding: one shared timestamp array plus float arrays per series
+- Rolling windows extended incrementally instead of re-running the full range query
+"""
+
+import bisect
+import math
+import threading
+
+
+def lttb_indices(xs, ys, threshold):
+    """
+    Pick the indices of the points LTTB keeps.
+
+    Args:
+        xs: Point x values (timestamps), ascending
+        ys: Point y values; non-finite values count as 0 for shape selection
+        threshold: Number of points to keep (the first and last are always kept)
+
+    Returns:
+        Ascending list of selected indices
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    ys = [y if math.isfinite(y) else 0.0 for y in ys]
+    selected = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_len = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / avg_len
+        avg_y = sum(ys[avg_start:avg_end]) / avg_len
+
+        # Keep the point in this bucket forming the largest triangle
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+
+        selected.append(next_a)
+        a = next_a
+
+    selected.append(n - 1)
+    return selected
+
+
+def downsample(values, max_points):
+    """Downsample Prometheus [[timestamp, "value"], ...] pairs, keeping the original pairs."""
+    if not max_points or len(values) <= max_points:
+        return values
+    xs = [float(v[0]) for v in values]
+    ys = [float(v[1]) for v in values]
+    return [values[i] for i in lttb_indices(xs, ys, max_points)]
+
+
+def downsample_series(series_list, max_points):
+    """Downsample every series of a Prometheus matrix result."""
+    if not max_points:
+        return series_list
+    return [
+        dict(series, values=downsample(series['values'], max_points))
+        for series in series_list
+    ]
+
+
+def to_columnar(series_list):
+    """
+    Encode a Prometheus matrix result as shared timestamps plus per-series floats.
+
+    Returns:
+        {'timestamps': [...], 'series': [{'metric': {...}, 'values': [...]}]}
+        where missing or non-finite samples are None
+    """
+    timestamps = sorted({v[0] for series in series_list for v in series['values']})
+    position = {ts: i for i, ts in enumerate(timestamps)}
+
+    encoded = []
+    for series in series_list:
+        column = [None] * len(timestamps)
+        for ts, value in series['values']:
+            number = float(value)
+            column[position[ts]] = number if math.isfinite(number) else None
+        encoded.append({'metric': series['metric'], 'values': column})
+
+    return {'timestamps': timestamps, 'series': encoded}
+
+
+class SeriesWindow:
+    """
+    Rolling window of one range query, extended with small incremental fetches.
+
+    Args:
+        window: Window length in seconds
+        step: Query resolution in seconds
+    """
+
+    def __init__(self, window, step):
+        self.window = window
+        self.step = step
+        self.end = None
+        self._series = {}  # sorted label items -> {'metric': {...}, 'values': [[ts, value], ...]}
+        self._lock = threading.Lock()
+
+    def refresh(self, fetch, end):
+        """
+        Extend the window up to end.
+
+        Args:
+            fetch: Callable (start, end) returning a Prometheus matrix result list, or None on failure
+            end: Step-aligned end timestamp
+
+        Returns:
+            True when the window is current, False when the fetch failed
+        """
+        with self._lock:
+            if self.end is not None and end <= self.end:
+                return True
+
+            full = self.end is None or end - self.end >= self.window
+            start = end - self.window if full else self.end + self.step
+            result = fetch(start, end)
+            if result is None:
+                return False
+
+            if full:
+                self._series = {}
+            for series in result:
+                key = tuple(sorted(series['metric'].items()))
+                entry = self._series.setdefault(key, {'metric': series['metric'], 'values': []})
+                last = entry['values'][-1][0] if entry['values'] else None
+                entry['values'].extend(v for v in series['values'] if last is None or v[0] > last)
+
+            cutoff = end - self.window
+            for key in list(self._series):
+                values = self._series[key]['values']
+                del values[:bisect.bisect_left(values, cutoff, key=lambda v: v[0])]
+                if not values:
+                    del self._series[key]
+
+            self.end = end
+            return True
+
+    def series(self, since=None):
+        """Return the window as a Prometheus matrix result, optionally only points after since."""
+        with self._lock:
+            result = []
+            for entry in self._series.values():
+                values = entry['values']
+                if since is not None:
+                    values = values[bisect.bisect_right(values, since, key=lambda v: v[0]):]
+                if values:
+                    result.append({'metric': entry['metric'], 'values': list(values)})
+            return result
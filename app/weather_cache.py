@@ -0,0 +1,201 @@
+"""
+Weather Cache - Serve the home page weather widget without waiting on weatherapi.com
+
+Features:
+- In-process TTL cache, optionally shared across workers through a JSON file
+- Stale-while-revalidate: expired data is served while one background thread refreshes it
+- Cold starts never block: the first load runs in the background (warm() starts it
+  as soon as a worker forks) and requests render without weather until it lands
+- Last-known-good fallback when the upstream is slow or failing
+- Hit/miss/refresh counters exported through the telemetry registry
+
+Configuration (environment):
+    WEATHER_CACHE_TTL       Seconds before cached weather is considered stale (default: 600)
+    WEATHER_CACHE_FILE      Optional path of a JSON file shared by all workers
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from prometheus_client import Counter
+
+from telemetry_middleware import registry
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+weather_cache_events_total = Counter(
+    'weather_cache_events_total',
+    'Weather cache lookups and refreshes',
+    ['event'],
+    registry=registry
+)
+
+# Pre-bound children, one per event type
+_hit = weather_cache_events_total.labels(event='hit')
+_stale = weather_cache_events_total.labels(event='stale')
+_miss = weather_cache_events_total.labels(event='miss')
+_refresh = weather_cache_events_total.labels(event='refresh')
+_refresh_error = weather_cache_events_total.labels(event='refresh_error')
+
+
+class WeatherCache:
+    """
+    TTL cache around a weather loader function.
+
+    Args:
+        loader: Callable returning the weather dict (may raise on failure)
+        ttl: Seconds before an entry is stale (default: WEATHER_CACHE_TTL or 600)
+        shared_path: Optional JSON file used to share entries across workers
+        retry_after: Seconds to wait before retrying a failed refresh
+    """
+
+    def __init__(self, loader, ttl=None, shared_path=None, retry_after=60):
+        self.loader = loader
+        self.ttl = float(ttl if ttl is not None else os.getenv('WEATHER_CACHE_TTL', 600))
+        self.shared_path = shared_path if shared_path is not None else os.getenv('WEATHER_CACHE_FILE')
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._entry = None  # (data, fetched_at), swapped atomically
+        self._shared_mtime = None
+        self._refreshing = False
+        self._next_attempt = 0.0
+
+    def get(self):
+        """Return cached weather, or None when nothing has ever been loaded."""
+        self._sync_from_shared()
+        now = time.time()
+
+        entry = self._entry
+        if entry is not None:
+            data, fetched_at = entry
+            if now - fetched_at < self.ttl:
+                _hit.inc()
+            else:
+                _stale.inc()
+                self._refresh_in_background(now)
+            return data
+
+        # Cold start: nothing to serve yet; the page renders without weather meanwhile
+        _miss.inc()
+        self._refresh_in_background(now)
+        return None
+
+    def warm(self):
+        """Start loading in the background unless an entry is already available."""
+        self._sync_from_shared()
+        if self._entry is None:
+            self._refresh_in_background(time.time())
+
+    def clear(self):
+        """Drop the in-memory entry (the shared file is left untouched)."""
+        with self._lock:
+            self._entry = None
+            self._shared_mtime = None
+            self._next_attempt = 0.0
+
+    def _refresh_in_background(self, now):
+        """Start a single refresh thread unless one is running or backing off."""
+        with self._lock:
+            if self._refreshing or now < self._next_attempt:
+                return
+            self._refreshing = True
+
+        thread = threading.Thread(target=self._background_refresh, name='weather-cache-refresh', daemon=True)
+        thread.start()
+
+    def _background_refresh(self):
+        try:
+            with _SharedRefreshLock(self.shared_path) as acquired:
+                # Another worker is already refreshing the shared file
+                if acquired:
+                    self._load()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _load(self):
+        """Call the loader and store the result, keeping the old entry on failure."""
+        try:
+            data = self.loader()
+        except Exception as e:
+            _refresh_error.inc()
+            self._next_attempt = time.time() + self.retry_after
+            logger.warning(f"Weather refresh failed, serving last known data: {e}")
+            return
+
+        _refresh.inc()
+        self._entry = (data, time.time())
+        self._write_shared()
+
+    def _sync_from_shared(self):
+        """Pick up a newer entry written by another worker."""
+        if not self.shared_path:
+            return
+        try:
+            mtime = os.stat(self.shared_path).st_mtime
+        except OSError:
+            return
+        if mtime == self._shared_mtime:
+            return
+
+        try:
+            with open(self.shared_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable weather cache file: {e}")
+            return
+
+        self._shared_mtime = mtime
+        current = self._entry
+        if current is None or entry.get('fetched_at', 0) > current[1]:
+            self._entry = (entry['data'], entry['fetched_at'])
+
+    def _write_shared(self):
+        if not self.shared_path:
+            return
+        data, fetched_at = self._entry
+        tmp_path = f"{self.shared_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'fetched_at': fetched_at, 'data': data}, f)
+            os.replace(tmp_path, self.shared_path)
+            self._shared_mtime = os.stat(self.shared_path).st_mtime
+        except OSError as e:
+            logger.warning(f"Failed to write weather cache file: {e}")
+
+
+class _SharedRefreshLock:
+    """Non-blocking cross-process lock so only one worker refreshes the shared file."""
+
+    def __init__(self, shared_path):
+        self.path = f"{shared_path}.lock" if shared_path and fcntl else None
+        self._fd = None
+
+    def __enter__(self):
+        if self.path is None:
+            return True
+        try:
+            self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            return False
+        return True
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        return False
@@ -0,0 +1,343 @@
+"""
+Load Test - Throughput and tail latency of every route against stub upstreams
+
+Starts local stand-ins for weatherapi and the Prometheus HTTP API (with
+injectable latency and failure rate), runs the app under gunicorn pointed at
+them, then drives every GET route of main_bp and metrics_api_bp plus /metrics
+at fixed concurrency levels. Reports RPS and p50/p95/p99 per route and level.
+
+Baselines: --save-baseline writes the results to the baseline file; later runs
+compare against it and exit non-zero when a route's p95 grows or its RPS drops
+by more than --threshold. Baselines only compare well on the same machine and
+with the same stub settings.
+
+The app keeps its caches (weather, pages, Prometheus queries) as in production;
+export e.g. PROMETHEUS_CACHE_TTL=0 to push every dashboard request upstream.
+
+Usage:
+    python benchmarks/load_test.py --save-baseline
+    python benchmarks/load_test.py [--concurrency 1 8 32] [--duration 3] [--threshold 0.2]
+                                   [--prometheus-latency-ms 20] [--prometheus-failure-rate 0.1]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# Long-lived responses that never finish on their own
+EXCLUDED_PATHS = {'/api/metrics/stream'}
+
+# Latency regressions smaller than this are noise on sub-millisecond routes
+MIN_SLACK_MS = 1.0
+
+
+class StubUpstream:
+    """
+    Threaded HTTP server answering every GET with respond(path, query).
+
+    Args:
+        respond: Callable returning a JSON-serializable body
+        latency: Seconds to wait before answering
+        failure_rate: Fraction of requests answered with 503
+    """
+
+    def __init__(self, respond, latency=0.0, failure_rate=0.0):
+        self.respond = respond
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                if random.random() < stub.failure_rate:
+                    status, body = 503, b'{"status": "error", "error": "injected failure"}'
+                else:
+                    query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                    status, body = 200, json.dumps(stub.respond(url.path, query)).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='stub-upstream', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def weather_response(path, query):
+    return {
+        'location': {'name': 'San Francisco'},
+        'current': {'temp_c': 17.0, 'condition': {'text': 'Partly cloudy', 'icon': '//cdn.weatherapi.com/116.png'}},
+    }
+
+
+STUB_APPS = ('portfolio', 'pra')
+STUB_COUNTRIES = ('US', 'FR', 'DE', 'GB', 'IN')
+
+
+def prometheus_response(path, query):
+    """Plausible vector/matrix results with the labels the section builders read."""
+    now = time.time()
+    labels = [{'app': app, 'job': app, 'country': country}
+              for app in STUB_APPS for country in STUB_COUNTRIES]
+    if path.endswith('/query_range'):
+        start, end, step = float(query['start']), float(query['end']), float(query['step'])
+        points = int((end - start) // step) + 1
+        result = [
+            {'metric': metric, 'values': [[start + i * step, f'{random.random():.4f}'] for i in range(points)]}
+            for metric in labels[:len(STUB_APPS)]
+        ]
+        return {'status': 'success', 'data': {'resultType': 'matrix', 'result': result}}
+    result = [{'metric': metric, 'value': [now, '1']} for metric in labels]
+    return {'status': 'success', 'data': {'resultType': 'vector', 'result': result}}
+
+
+def discover_routes():
+    """Argument-free GET paths of main_bp and metrics_api_bp, plus /metrics."""
+    from flask import Flask
+
+    from app.routes.main import main_bp
+    from app.routes.metrics_api import metrics_api_bp
+
+    app = Flask(__name__)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(metrics_api_bp)
+    paths = sorted(
+        rule.rule for rule in app.url_map.iter_rules()
+        if rule.endpoint != 'static' and 'GET' in rule.methods and not rule.arguments
+        and rule.rule not in EXCLUDED_PATHS
+    )
+    return paths + ['/metrics']
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values), max(1, math.ceil(q * len(sorted_values)))) - 1
+    return sorted_values[rank]
+
+
+def drive(url, concurrency, duration):
+    """
+    Send requests from concurrency keep-alive clients for duration seconds.
+
+    Returns:
+        {'requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms'}
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+    stop_at = [0.0]
+
+    def client():
+        session = requests.Session()
+        own, failed = [], 0
+        barrier.wait()
+        while time.perf_counter() < stop_at[0]:
+            started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=30)
+                response.content
+                if response.status_code >= 500:
+                    failed += 1
+            except requests.RequestException:
+                failed += 1
+            own.append(time.perf_counter() - started)
+        session.close()
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for c in clients:
+        c.start()
+    started = time.perf_counter()
+    stop_at[0] = started + duration
+    barrier.wait()
+    for c in clients:
+        c.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Routes whose p95 grew or RPS dropped by more than threshold (a fraction).
+
+    Returns:
+        List of human-readable regression descriptions
+    """
+    regressions = []
+    for path, levels in results.items():
+        for level, current in levels.items():
+            previous = baseline.get(path, {}).get(level)
+            if previous is None:
+                continue
+            allowed_p95 = max(previous['p95_ms'] * (1 + threshold), previous['p95_ms'] + MIN_SLACK_MS)
+            if current['p95_ms'] > allowed_p95:
+                regressions.append(f"{path} @{level}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+            if current['rps'] < previous['rps'] * (1 - threshold):
+                regressions.append(f"{path} @{level}: rps {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+def start_app(port, weather, prometheus, workers, threads, metrics_dir):
+    env = dict(
+        os.environ,
+        WEATHER_URL=f'{weather.url}/v1/current.json',
+        PROMETHEUS_BASE_URL=prometheus.url,
+        PROMETHEUS_MULTIPROC_DIR=metrics_dir,
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_THREADS=str(threads),
+        # No recycling in the middle of a measurement
+        GUNICORN_MAX_REQUESTS='0',
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {process.returncode}')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/health', timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 30s')
+
+
+def free_port():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BaseHTTPRequestHandler)
+    port = server.server_address[1]
+    server.server_close()
+    return port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per route and level')
+    parser.add_argument('--routes', nargs='+', help='only these paths (default: every route)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--weather-latency-ms', type=float, default=100)
+    parser.add_argument('--weather-failure-rate', type=float, default=0.0)
+    parser.add_argument('--prometheus-latency-ms', type=float, default=20)
+    parser.add_argument('--prometheus-failure-rate', type=float, default=0.0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed fractional regression')
+    args = parser.parse_args()
+
+    config = {
+        'concurrency': args.concurrency, 'duration': args.duration,
+        'workers': args.workers, 'threads': args.threads,
+        'weather_latency_ms': args.weather_latency_ms, 'weather_failure_rate': args.weather_failure_rate,
+        'prometheus_latency_ms': args.prometheus_latency_ms,
+        'prometheus_failure_rate': args.prometheus_failure_rate,
+    }
+
+    weather = StubUpstream(weather_response, args.weather_latency_ms / 1000, args.weather_failure_rate).start()
+    prometheus = StubUpstream(prometheus_response, args.prometheus_latency_ms / 1000,
+                              args.prometheus_failure_rate).start()
+    paths = args.routes or discover_routes()
+    port = free_port()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='load-test-metrics-') as metrics_dir:
+        app = start_app(port, weather, prometheus, args.workers, args.threads, metrics_dir)
+        try:
+            print(f"{'route':<34} {'conc':>4} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+            for path in paths:
+                url = f'http://127.0.0.1:{port}{path}'
+                # Warm caches (weather, page cache, query cache) before measuring
+                for _ in range(3):
+                    requests.get(url, timeout=30)
+                results[path] = {}
+                for level in args.concurrency:
+                    row = results[path][str(level)] = drive(url, level, args.duration)
+                    print(f"{path:<34} {level:>4} {row['rps']:>9,.1f} {row['p50_ms']:>8.2f} "
+                          f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['errors']:>6}")
+        finally:
+            app.terminate()
+            app.wait(timeout=30)
+            weather.stop()
+            prometheus.stop()
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; run with --save-baseline first')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != config:
+        print('Warning: baseline was recorded with different settings:', baseline.get('config'))
+
+    regressions = compare(results, baseline['results'], args.threshold)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Metrics Exposition Benchmark - CPU time and bytes per /metrics scrape
+
+Fills a private registry with a realistic label mix, then compares serializing
+it on every scrape (the old /metrics path) against MetricsExposition with gzip
+and a snapshot reused across scrapes, for both exposition formats.
+
+Usage:
+    python benchmarks/metrics_exposition.py [--scrapes 200] [--ttl 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST as OPENMETRICS
+
+from metrics_store import LocalMetricsStore
+from telemetry_middleware import MetricsExposition, RequestMetrics
+
+ROUTES = ['main.base', 'main.journey', 'main.portfolio', 'main.certifications', 'main.contact',
+          'metrics_api.get_live_metrics', 'metrics_api.get_dashboard_metrics', 'downloads.download',
+          'assets.serve', 'metrics']
+COUNTRIES = ['US', 'FR', 'DE', 'GB', 'IN', 'CA', 'JP', 'BR', 'NL', 'AU']
+STATUSES = [200, 304, 404, 503]
+
+
+def populated_registry():
+    registry = CollectorRegistry()
+    metrics = RequestMetrics(
+        'bench',
+        Counter('http_requests_total', '', ['method', 'route', 'status_code', 'app', 'country'], registry=registry),
+        Histogram('http_request_duration_seconds', '', ['method', 'route', 'status_code', 'app'],
+                  buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10], registry=registry),
+        Counter('http_errors_total', '', ['method', 'route', 'status_code', 'app', 'error_type'], registry=registry),
+        LocalMetricsStore(),
+    )
+    for route in ROUTES:
+        for status in STATUSES:
+            for country in COUNTRIES:
+                metrics.record('GET', route, status, country, 0.012)
+    return registry
+
+
+def scrape_cost(render, scrapes):
+    """(CPU ms per scrape, bytes per scrape)."""
+    size = len(render())
+    start = time.process_time()
+    for _ in range(scrapes):
+        render()
+    return (time.process_time() - start) / scrapes * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scrapes', type=int, default=200)
+    parser.add_argument('--ttl', type=float, default=5.0)
+    args = parser.parse_args()
+
+    registry = populated_registry()
+    fresh = MetricsExposition(ttl=0, source=registry)
+    snapshot = MetricsExposition(ttl=args.ttl, source=registry)
+
+    variants = [
+        ('text, serialize every scrape', lambda: generate_latest(registry)),
+        ('text + gzip', lambda: fresh.render(None, 'gzip')[0]),
+        ('openmetrics + gzip', lambda: fresh.render(OPENMETRICS, 'gzip')[0]),
+        (f'text + gzip, {args.ttl:g}s snapshot', lambda: snapshot.render(None, 'gzip')[0]),
+    ]
+
+    print(f"{'variant':<32}  {'cpu ms/scrape':>13}  {'bytes':>8}")
+    for name, render in variants:
+        cpu_ms, size = scrape_cost(render, args.scrapes)
+        print(f'{name:<32}  {cpu_ms:>13.3f}  {size:>8,}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Metrics Recording Benchmark - Throughput of per-request metric updates
+
+Compares recording the request metrics with .labels() on every call (the old
+after_request path) against RequestMetrics' cached children, at several thread
+counts. Each variant records into its own registry.
+
+Measured locally, the cached children record roughly 1.3-1.8x as many
+requests per second as .labels() at 1, 4 and 16 threads, not the 3-5x
+first reported.
+
+Usage:
+    python benchmarks/metrics_recording.py [--records 200000] [--threads 1 4 16]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+from metrics_store import LocalMetricsStore
+from telemetry_middleware import RequestMetrics
+
+# A realistic mix: a handful of routes, countries and statuses
+LABEL_MIX = [
+    ('GET', route, status, country)
+    for route in ('main.base', 'main.journey', 'metrics_api.get_live_metrics', 'metrics')
+    for status in (200, 200, 200, 304, 404, 503)
+    for country in ('FR', 'US', 'DE')
+]
+
+
+def make_metrics():
+    registry = CollectorRegistry()
+    return {
+        'requests': Counter('http_requests_total', '', ['method', 'route', 'status_code', 'app', 'country'],
+                            registry=registry),
+        'duration': Histogram('http_request_duration_seconds', '', ['method', 'route', 'status_code', 'app'],
+                              buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+                              registry=registry),
+        'errors': Counter('http_errors_total', '', ['method', 'route', 'status_code', 'app', 'error_type'],
+                          registry=registry),
+        'in_flight': Gauge('http_requests_in_flight', '', ['app'], registry=registry),
+    }
+
+
+def labels_recorder():
+    m = make_metrics()
+
+    def record(method, route, status_code, country, duration):
+        m['in_flight'].labels(app='bench').inc()
+        m['requests'].labels(method=method, route=route, status_code=str(status_code),
+                             app='bench', country=country).inc()
+        m['duration'].labels(method=method, route=route, status_code=str(status_code),
+                             app='bench').observe(duration)
+        if status_code >= 400:
+            error_type = 'server_error' if status_code >= 500 else 'client_error'
+            m['errors'].labels(method=method, route=route, status_code=str(status_code),
+                               app='bench', error_type=error_type).inc()
+        m['in_flight'].labels(app='bench').dec()
+
+    return record
+
+
+def bound_recorder():
+    m = make_metrics()
+    request_metrics = RequestMetrics('bench', m['requests'], m['duration'], m['errors'], LocalMetricsStore())
+    in_flight = m['in_flight'].labels(app='bench')
+
+    def record(method, route, status_code, country, duration):
+        in_flight.inc()
+        request_metrics.record(method, route, status_code, country, duration)
+        in_flight.dec()
+
+    return record
+
+
+def throughput(record, records, threads):
+    """Records per second with records split evenly across threads."""
+    per_thread = records // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        mix = LABEL_MIX
+        size = len(mix)
+        barrier.wait()
+        for i in range(per_thread):
+            method, route, status, country = mix[(i + offset) % size]
+            record(method, route, status, country, 0.012)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    print(f"{'threads':>7}  {'labels() rec/s':>15}  {'bound rec/s':>12}  {'speedup':>7}")
+    for threads in args.threads:
+        before = throughput(labels_recorder(), args.records, threads)
+        after = throughput(bound_recorder(), args.records, threads)
+        print(f"{threads:>7}  {before:>15,.0f}  {after:>12,.0f}  {after / before:>6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Middleware Overhead Microbenchmark - Per-request cost of telemetry_middleware
+
+Times identical requests against a bare Flask app and the same app with
+setup_telemetry, and reports the difference. Every request is logged (no
+sampling) so the figure is the worst case; the log listener discards records
+so only the request-thread cost is measured.
+
+Usage:
+    python benchmarks/middleware_overhead.py [--requests 2000] [--rounds 5] [--budget-ms 2]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+import log_pipeline
+from telemetry_middleware import setup_telemetry
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36 Edg/126.0',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:127.0) Gecko/20100101 Firefox/127.0',
+]
+
+
+def make_app(telemetry):
+    app = Flask(__name__)
+
+    @app.route('/ok')
+    def ok():
+        return 'ok'
+
+    if telemetry:
+        setup_telemetry(app, app_name='bench', log_rules=[])
+        # Keep the queue and listener but drop the output instead of writing to stderr
+        log_pipeline.install([logging.NullHandler()], logger=logging.getLogger())
+    return app
+
+
+def time_requests(app, requests):
+    client = app.test_client()
+    start = time.perf_counter()
+    for i in range(requests):
+        client.get('/ok', headers={
+            'User-Agent': USER_AGENTS[i % len(USER_AGENTS)],
+            'CF-Connecting-IP': f'203.0.113.{i % 50}',
+            'CF-IPCountry': 'FR',
+        })
+    return (time.perf_counter() - start) / requests * 1000
+
+
+def measure_overhead(requests=2000, rounds=5):
+    """
+    Measure per-request middleware overhead.
+
+    Returns:
+        {'bare_ms': ..., 'telemetry_ms': ..., 'overhead_ms': ...}; each figure is
+        the best per-request average over the rounds
+    """
+    bare = make_app(telemetry=False)
+    instrumented = make_app(telemetry=True)
+    try:
+        # Warm caches, imports and the werkzeug test client
+        time_requests(bare, 50)
+        time_requests(instrumented, 50)
+        bare_ms = min(time_requests(bare, requests) for _ in range(rounds))
+        telemetry_ms = min(time_requests(instrumented, requests) for _ in range(rounds))
+    finally:
+        log_pipeline.shutdown()
+
+    return {
+        'bare_ms': round(bare_ms, 4),
+        'telemetry_ms': round(telemetry_ms, 4),
+        'overhead_ms': round(telemetry_ms - bare_ms, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    result = measure_overhead(args.requests, args.rounds)
+    print(f"bare:       {result['bare_ms']:.3f} ms/request")
+    print(f"telemetry:  {result['telemetry_ms']:.3f} ms/request")
+    print(f"overhead:   {result['overhead_ms']:.3f} ms/request (budget {args.budget_ms} ms)")
+    return 0 if result['overhead_ms'] < args.budget_ms else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Gunicorn configuration
+
+Worker model (environment variables, defaults derived from the CPU count):
+- GUNICORN_WORKER_CLASS: 'gthread' (default), 'sync' or 'gevent' (needs gevent installed)
+- GUNICORN_WORKERS: worker processes (gthread/gevent: CPUs, sync: 2 * CPUs + 1)
+- GUNICORN_THREADS: threads per gthread worker (default 8)
+- GUNICORN_WORKER_CONNECTIONS: concurrent connections per gevent worker (default 1000)
+- GUNICORN_TIMEOUT / GUNICORN_GRACEFUL_TIMEOUT: seconds (default 30 / 30)
+- GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER: recycle workers after
+  this many requests (default 1000 / 100, 0 disables)
+- GUNICORN_PRELOAD: load the app in the master and fork workers from it (default 1)
+
+Thread budget: each open /api/metrics/stream client holds a worker thread for
+as long as it stays connected. METRICS_STREAM_MAX_CLIENTS is therefore set per
+worker from the thread count: half the threads by default, and never more than
+threads - 1, so pages and the HEALTHCHECK always find a free thread. Sync
+workers (one thread) refuse streams, and the dashboard falls back to polling.
+gevent workers keep the stream module's own default.
+
+The app is preloaded so workers share its memory copy-on-write. Modules that own
+threads, locks or sockets (log_pipeline, app.http_client) reset them after fork.
+
+Multi-process metrics (opt-in): export PROMETHEUS_MULTIPROC_DIR pointing at a
+writable directory (ideally tmpfs) before starting gunicorn. Every worker then
+records into mmap-backed files there and /metrics aggregates all of them, so a
+scrape no longer returns whichever worker happened to answer.
+
+Usage:
+    PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+
+cpus = os.cpu_count() or 1
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+default_workers = 2 * cpus + 1 if worker_class == 'sync' else cpus
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
+threads = int(os.getenv('GUNICORN_THREADS', 8)) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Read by app.metrics_stream when the app is loaded, after this file
+if worker_class != 'gevent':
+    stream_limit = threads - 1
+    requested = os.getenv('METRICS_STREAM_MAX_CLIENTS')
+    os.environ['METRICS_STREAM_MAX_CLIENTS'] = str(
+        min(int(requested), stream_limit) if requested else min(threads // 2, stream_limit)
+    )
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycling bounds slow memory growth; jitter keeps workers from restarting together
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Requests are already logged as JSON by telemetry_middleware
+accesslog = None
+errorlog = '-'
+
+# prometheus_client opens its files as soon as metrics are defined, which with
+# preload_app happens in the master before on_starting runs
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    """Start from an empty metrics directory; stale files would inflate counters."""
+    from telemetry_middleware import reset_multiprocess_dir
+    reset_multiprocess_dir()
+
+
+def post_fork(server, worker):
+    """Fetch the weather before the first request needs it (threads do not survive the fork)."""
+    from app.routes.main import weather_cache
+    weather_cache.warm()
+
+
+def worker_exit(server, worker):
+    """Publish the worker's latest top-k summaries so child_exit archives them complete."""
+    from metrics_store import local_metrics
+    local_metrics.shared_countries.publish()
+
+
+def child_exit(server, worker):
+    """Stop counting a dead worker's live gauges and archive its counters and histograms."""
+    from telemetry_middleware import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -0,0 +1,405 @@
+"""
+Log Pipeline - Keep log formatting and disk I/O off the request thread
+
+Request threads only put records on a bounded queue; a background listener
+formats them and writes them to the real handlers in batches, with one write
+and one flush per handler per batch.
+
+Features:
+- Bounded queue with a drop (counted) or block overflow policy
+- Batched writes for stream/file handlers, or any handler with emit_batch(records)
+- Clean flush at interpreter exit, and a fresh listener in forked workers
+- ManagedFileHandler: size/time rotation shared safely by several worker
+  processes, background gzip of rotated segments and a total-bytes retention cap
+
+Usage:
+    import log_pipeline
+
+    log_pipeline.install([logging.StreamHandler()], on_drop=dropped_counter.inc)
+
+Configuration (environment):
+    LOG_QUEUE_SIZE        Maximum queued records (default: 10000)
+    LOG_QUEUE_OVERFLOW    'drop' or 'block' when the queue is full (default: drop)
+    LOG_BATCH_SIZE        Maximum records written per batch (default: 256)
+    LOG_MAX_BYTES         Rotate the log file past this size (default: 10 MiB, 0 disables)
+    LOG_ROTATE_INTERVAL   Also rotate every N seconds, e.g. 86400 (default: 0, disabled)
+    LOG_RETENTION_BYTES   Delete the oldest rotated segments past this total (default: 100 MiB)
+    LOG_COMPRESS          Gzip rotated segments in the background (default: 1)
+"""
+
+import atexit
+import copy
+import glob
+import gzip
+import logging
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+OVERFLOW_POLICIES = ('drop', 'block')
+
+_SENTINEL = None
+
+_lock = threading.Lock()
+_pipeline = None
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller unless asked to.
+
+    Unlike QueueHandler, records are not formatted on the caller's thread: only
+    msg % args is resolved (so mutable arguments are captured as they were),
+    and exc_info and extra fields stay on the record for the listener's
+    formatter, which keeps a JsonFormatter's traceback in its own field.
+
+    Args:
+        log_queue: Bounded queue.Queue shared with the listener
+        overflow: 'drop' discards records when the queue is full, 'block' waits for room
+        on_drop: Optional callable invoked once per dropped record
+    """
+
+    def __init__(self, log_queue, overflow='drop', on_drop=None):
+        super().__init__(log_queue)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        self.overflow = overflow
+        self.on_drop = on_drop
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.overflow == 'block':
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.on_drop is not None:
+                self.on_drop()
+
+
+class BatchingQueueListener:
+    """
+    Background thread draining a queue into handlers, batch by batch.
+
+    Args:
+        log_queue: Queue fed by a BoundedQueueHandler
+        handlers: Destination handlers
+        batch_size: Maximum records taken off the queue per write
+    """
+
+    def __init__(self, log_queue, handlers, batch_size=256):
+        self.queue = log_queue
+        self.handlers = list(handlers)
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-pipeline', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Write everything already queued, then stop the thread."""
+        if self._thread is None:
+            return
+        self.queue.put(_SENTINEL)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            batch = []
+            stopping = record is _SENTINEL
+            if not stopping:
+                batch.append(record)
+
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _SENTINEL:
+                    stopping = True
+                else:
+                    batch.append(record)
+
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch):
+        for handler in self.handlers:
+            records = [r for r in batch if r.levelno >= handler.level and handler.filter(r)]
+            if not records:
+                continue
+            try:
+                write_batch(handler, records)
+            except Exception:
+                handler.handleError(records[-1])
+
+
+def write_batch(handler, records):
+    """Emit records through handler with a single write and flush where possible."""
+    emit_batch = getattr(handler, 'emit_batch', None)
+    if emit_batch is not None:
+        emit_batch(records)
+        return
+
+    if not isinstance(handler, logging.StreamHandler):
+        for record in records:
+            handler.handle(record)
+        return
+
+    text = ''.join(handler.format(record) + handler.terminator for record in records)
+    with handler.lock:
+        if isinstance(handler, logging.FileHandler) and handler.stream is None:
+            handler.stream = handler._open()
+        handler.stream.write(text)
+        handler.flush()
+
+
+class ManagedFileHandler(logging.FileHandler):
+    """
+    Append-only log file with rotation that is safe across worker processes.
+
+    Every batch is written under an exclusive flock on a sidecar lock file.
+    Under that lock the handler reopens the path if another process already
+    rotated it, rotates by renaming when the size or time limit is reached, and
+    appends. Rename-based rotation is what Promtail expects: it keeps reading
+    the renamed file to EOF and then follows the new file at the same path.
+
+    Args:
+        filename: Log file path
+        max_bytes: Rotate before a write would grow the file past this (0 disables)
+        rotate_interval: Rotate when the file was last written in an earlier interval (0 disables)
+        retention_bytes: Total size cap for rotated segments, oldest deleted first
+        compress: Gzip rotated segments in a background thread
+    """
+
+    def __init__(self, filename, max_bytes=None, rotate_interval=None, retention_bytes=None,
+                 compress=None, encoding='utf-8'):
+        super().__init__(filename, mode='a', encoding=encoding, delay=True)
+        self.max_bytes = int(max_bytes if max_bytes is not None else os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+        self.rotate_interval = int(
+            rotate_interval if rotate_interval is not None else os.getenv('LOG_ROTATE_INTERVAL', 0)
+        )
+        self.retention_bytes = int(
+            retention_bytes if retention_bytes is not None else os.getenv('LOG_RETENTION_BYTES', 100 * 1024 * 1024)
+        )
+        self.compress = compress if compress is not None else os.getenv('LOG_COMPRESS', '1') not in ('0', 'false', 'no')
+        self.lock_path = self.baseFilename + '.lock'
+
+    def emit(self, record):
+        try:
+            self.emit_batch([record])
+        except Exception:
+            self.handleError(record)
+
+    def emit_batch(self, records):
+        text = ''.join(self.format(record) + self.terminator for record in records)
+        with self.lock, _FileLock(self.lock_path):
+            self._reopen_if_rotated()
+            if self._should_rotate(len(text.encode(self.encoding or 'utf-8'))):
+                self._rotate()
+            self.stream.write(text)
+            self.stream.flush()
+
+    def _reopen_if_rotated(self):
+        if self.stream is not None:
+            try:
+                current = os.stat(self.baseFilename)
+                if current.st_ino == os.fstat(self.stream.fileno()).st_ino:
+                    return
+            except FileNotFoundError:
+                pass
+            self.stream.close()
+        self.stream = self._open()
+
+    def _should_rotate(self, incoming):
+        stat = os.fstat(self.stream.fileno())
+        if stat.st_size == 0:
+            return False
+        if self.max_bytes and stat.st_size + incoming > self.max_bytes:
+            return True
+        if self.rotate_interval:
+            period_start = time.time() // self.rotate_interval * self.rotate_interval
+            return stat.st_mtime < period_start
+        return False
+
+    def _rotate(self):
+        self.stream.close()
+        # Microsecond timestamps keep segment names unique and sorted oldest first
+        micros = int(time.time() * 1_000_000)
+        while True:
+            stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(micros // 1_000_000))
+            segment = f"{self.baseFilename}.{stamp}-{micros % 1_000_000:06d}"
+            if not (os.path.exists(segment) or os.path.exists(segment + '.gz')):
+                break
+            micros += 1
+        os.rename(self.baseFilename, segment)
+        self.stream = self._open()
+
+        threading.Thread(target=self._finish_segment, args=(segment,), name='log-rotate', daemon=True).start()
+
+    def _finish_segment(self, segment):
+        """Compress a rotated segment, then enforce the retention cap."""
+        try:
+            if self.compress:
+                with open(segment, 'rb') as src, gzip.open(segment + '.gz.tmp', 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(segment + '.gz.tmp', segment + '.gz')
+                os.unlink(segment)
+            self._prune()
+        except OSError as e:
+            # Not logged through logging: this runs underneath the log pipeline
+            print(f"log rotation cleanup failed for {segment}: {e}", file=sys.stderr)
+
+    def _prune(self):
+        segments = []
+        for path in glob.glob(glob.escape(self.baseFilename) + '.*'):
+            if path == self.lock_path or path.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            segments.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in segments)
+        for _, size, path in sorted(segments):
+            if total <= self.retention_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class _FileLock:
+    """Blocking exclusive flock on a sidecar file, opened per use so forked workers never share it."""
+
+    def __init__(self, path):
+        self.path = path if fcntl else None
+        self._fd = None
+
+    def __enter__(self):
+        if self.path is not None:
+            self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        return False
+
+
+class _Pipeline:
+    def __init__(self, logger, handlers, queue_size, overflow, batch_size, on_drop):
+        self.logger = logger
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.queue_handler = BoundedQueueHandler(queue.Queue(queue_size), overflow, on_drop)
+        self.listener = BatchingQueueListener(self.queue_handler.queue, handlers, batch_size)
+
+    def restart_in_child(self):
+        # The parent's listener thread does not exist here and its queue lock may be held
+        self.queue_handler.queue = queue.Queue(self.queue_size)
+        self.queue_handler.createLock()
+        self.listener = BatchingQueueListener(self.queue_handler.queue, self.handlers, self.batch_size)
+        self.listener.start()
+
+
+def install(handlers, logger=None, queue_size=None, overflow=None, batch_size=None, on_drop=None):
+    """
+    Route a logger's records through a bounded queue to handlers.
+
+    Replaces the logger's existing handlers with a single queue handler and
+    starts the background listener. Calling it again shuts down (and closes)
+    the previous pipeline first.
+
+    Args:
+        handlers: Destination handlers, written to by the background listener
+        logger: Logger to install on (default: root logger)
+        queue_size: Maximum queued records (default: LOG_QUEUE_SIZE or 10000)
+        overflow: 'drop' or 'block' (default: LOG_QUEUE_OVERFLOW or 'drop')
+        batch_size: Maximum records per write (default: LOG_BATCH_SIZE or 256)
+        on_drop: Callable invoked once per dropped record
+
+    Returns:
+        The BoundedQueueHandler installed on the logger
+    """
+    global _pipeline
+
+    if logger is None:
+        logger = logging.getLogger()
+    if queue_size is None:
+        queue_size = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    if overflow is None:
+        overflow = os.getenv('LOG_QUEUE_OVERFLOW', 'drop')
+    if batch_size is None:
+        batch_size = int(os.getenv('LOG_BATCH_SIZE', 256))
+
+    shutdown()
+
+    with _lock:
+        pipeline = _Pipeline(logger, list(handlers), queue_size, overflow, batch_size, on_drop)
+        logger.handlers = [pipeline.queue_handler]
+        pipeline.listener.start()
+        _pipeline = pipeline
+
+    return pipeline.queue_handler
+
+
+def shutdown():
+    """Flush queued records, stop the listener and close its handlers."""
+    global _pipeline
+
+    with _lock:
+        pipeline, _pipeline = _pipeline, None
+    if pipeline is None:
+        return
+
+    pipeline.logger.removeHandler(pipeline.queue_handler)
+    pipeline.listener.stop()
+    for handler in pipeline.handlers:
+        try:
+            handler.close()
+        except Exception:
+            pass
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+    if _pipeline is not None:
+        _pipeline.restart_in_child()
+
+
+atexit.register(shutdown)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
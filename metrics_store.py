@@ -0,0 +1,515 @@
+"""
+Local Metrics Store - Fixed-memory request metrics kept inside the process
+
+Features:
+- Ring buffers of time buckets backed by array('d'), sized once at startup:
+  10 s buckets for the last hour and 5 min buckets for the last day
+- Per bucket: request count, status classes, duration sum and the latency
+  histogram (same bounds as http_request_duration_seconds)
+- Rate, p95 latency and error rate over any window up to 24h, computed with
+  whole-column slice sums instead of per-request Python objects
+- Sliding 24h top-k of countries (Space-Saving over hourly buckets) with
+  per-entry error bounds, in memory bounded by the counter capacity
+- Top-k shared across gunicorn workers: each worker publishes its per-bucket
+  summaries to PROMETHEUS_MULTIPROC_DIR and reads merge all of them; dead
+  workers' summaries are folded into an archive file
+- Lets the metrics API answer without Prometheus (see METRICS_SOURCE in
+  app/routes/metrics_api.py)
+
+Each process keeps its own rings, so with several gunicorn workers a local
+rate or latency covers the traffic of the worker that served it; the country
+top-k (local_metrics.shared_countries) covers every worker.
+
+Usage:
+    from metrics_store import local_metrics
+
+    local_metrics.record(status_code=200, duration=0.012, country='FR')
+    local_metrics.summary(300)  # {'requests': ..., 'request_rate': ..., 'response_time_p95': ..., 'error_rate': ...}
+    local_metrics.shared_countries.top(10)  # [{'item': 'FR', 'count': ..., 'error': ...}, ...], total
+"""
+
+import bisect
+import glob
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms (no gunicorn there either)
+    fcntl = None
+
+# Same bounds as http_request_duration_seconds, so local and Prometheus p95 agree
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Column layout of every ring
+REQUESTS = 0
+STATUS = 1           # status_1xx .. status_5xx
+DURATION_SUM = 6
+LE = 7               # one column per bucket bound, then +Inf
+COLUMNS = LE + len(DURATION_BUCKETS) + 1
+
+# (bucket seconds, slots): one hour at 10 s, one day at 5 min
+TIERS = ((10, 360), (300, 288))
+
+# Heavy hitters: counters per hourly bucket, 24 buckets
+TOPK_CAPACITY = 64
+TOPK_BUCKET_SECONDS = 3600
+TOPK_BUCKETS = 24
+
+# Seconds between writes of a worker's top-k summary, and reuse of a merged read
+TOPK_SHARE_INTERVAL = 5
+
+
+class RingBuffer:
+    """
+    Fixed number of time buckets, one array('d') column per field.
+
+    Args:
+        resolution: Bucket length in seconds
+        slots: Number of buckets kept
+    """
+
+    def __init__(self, resolution, slots):
+        self.resolution = resolution
+        self.slots = slots
+        self.columns = [array('d', bytes(8 * slots)) for _ in range(COLUMNS)]
+        self._zeros = array('d', bytes(8 * slots))
+        self.head = None  # newest bucket number
+
+    @property
+    def span(self):
+        return self.resolution * self.slots
+
+    def advance(self, bucket):
+        """Move the head to bucket, clearing every slot that is reused."""
+        if self.head is None or bucket - self.head >= self.slots:
+            for column in self.columns:
+                column[:] = self._zeros
+        elif bucket > self.head:
+            self._clear(self.head + 1, bucket)
+        if self.head is None or bucket > self.head:
+            self.head = bucket
+
+    def _clear(self, first, last):
+        start, end = first % self.slots, last % self.slots
+        for column in self.columns:
+            if start <= end:
+                column[start:end + 1] = self._zeros[:end + 1 - start]
+            else:
+                column[start:] = self._zeros[:self.slots - start]
+                column[:end + 1] = self._zeros[:end + 1]
+
+    def window_slices(self, count):
+        """Slice bounds covering the newest count slots: one or two (start, end) pairs."""
+        count = min(count, self.slots)
+        end = self.head % self.slots + 1
+        start = end - count
+        if start >= 0:
+            return [(start, end)]
+        return [(self.slots + start, self.slots), (0, end)]
+
+    def totals(self, count):
+        """Per-column sums over the newest count slots."""
+        slices = self.window_slices(count)
+        return [sum(sum(column[a:b]) for a, b in slices) for column in self.columns]
+
+
+def quantile(q, bucket_counts):
+    """
+    Estimate a quantile from non-cumulative histogram counts (like histogram_quantile).
+
+    Returns:
+        Seconds, or None when there are no observations
+    """
+    total = sum(bucket_counts)
+    if total <= 0:
+        return None
+    rank = q * total
+    cumulative = 0.0
+    for i, count in enumerate(bucket_counts):
+        if cumulative + count >= rank and count > 0:
+            if i == len(DURATION_BUCKETS):
+                return DURATION_BUCKETS[-1]
+            lower = DURATION_BUCKETS[i - 1] if i else 0.0
+            return lower + (DURATION_BUCKETS[i] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return DURATION_BUCKETS[-1]
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters summary with a fixed number of counters.
+
+    Every monitored count is an overestimate by at most its error; any item not
+    monitored occurred at most `floor` times.
+
+    Args:
+        capacity: Number of counters kept
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counters = {}  # item -> [count, error]
+        self.total = 0
+
+    def add(self, item, count=1):
+        self.total += count
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+        else:
+            # Replace the smallest counter; its count becomes the newcomer's error
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            smallest = self.counters.pop(victim)[0]
+            self.counters[item] = [smallest + count, smallest]
+
+    @property
+    def floor(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+
+def merge_summaries(summaries, capacity):
+    """
+    Merge (counters, floor) pairs into one pair keeping at most capacity counters.
+
+    An item missing from a summary may still have occurred up to that summary's
+    floor times, which is added to both its count and its error. Every item
+    therefore starts from the sum of all floors and each summary holding it
+    replaces its floor with its own counter, which keeps the merge linear in
+    the number of counters.
+    """
+    floor = sum(floor for _, floor in summaries)
+    merged = {}
+    for counters, summary_floor in summaries:
+        for item, (count, error) in counters.items():
+            entry = merged.get(item)
+            if entry is None:
+                entry = merged[item] = [floor, floor]
+            entry[0] += count - summary_floor
+            entry[1] += error - summary_floor
+
+    if len(merged) > capacity:
+        kept = heapq.nlargest(capacity, merged.items(), key=lambda entry: entry[1][0])
+        floor = max(floor, min(counter[0] for _, counter in kept))
+        merged = dict(kept)
+    return merged, floor
+
+
+class WindowedTopK:
+    """
+    Approximate top-k over a sliding window of time buckets.
+
+    The current bucket is a live SpaceSaving summary; closed buckets are merged
+    once per bucket rollover, so reads only merge two summaries of at most
+    capacity counters each.
+
+    Args:
+        capacity: Counters per summary
+        bucket_seconds: Bucket length in seconds
+        buckets: Buckets in the window
+    """
+
+    def __init__(self, capacity=TOPK_CAPACITY, bucket_seconds=TOPK_BUCKET_SECONDS, buckets=TOPK_BUCKETS):
+        self.capacity = capacity
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self._summaries = deque()  # (bucket number, SpaceSaving), oldest first
+        self._closed = ({}, 0)
+        self._closed_total = 0
+        self._lock = threading.Lock()
+
+    def _rotate(self, bucket):
+        if self._summaries and self._summaries[-1][0] == bucket:
+            return
+        if self._summaries and self._summaries[-1][0] > bucket:
+            return
+        self._summaries.append((bucket, SpaceSaving(self.capacity)))
+        while self._summaries[0][0] <= bucket - self.buckets:
+            self._summaries.popleft()
+        closed = [summary for _, summary in list(self._summaries)[:-1]]
+        self._closed = merge_summaries([(s.counters, s.floor) for s in closed], self.capacity)
+        self._closed_total = sum(s.total for s in closed)
+
+    def add(self, item, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._rotate(int(now // self.bucket_seconds))
+            self._summaries[-1][1].add(item)
+
+    def summaries(self, now=None):
+        """
+        Per-bucket summaries within the window, oldest first.
+
+        Returns:
+            List of (bucket number, counters, floor, total), copied
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._rotate(int(now // self.bucket_seconds))
+            return [(bucket, {item: list(counter) for item, counter in summary.counters.items()},
+                     summary.floor, summary.total)
+                    for bucket, summary in self._summaries]
+
+    def top(self, n, now=None):
+        """
+        Top n items over the window.
+
+        Returns:
+            (entries, total): entries are {'item', 'count', 'error'} sorted by
+            count, where the true count lies in [count - error, count]; total
+            is the exact number of items added within the window
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._rotate(int(now // self.bucket_seconds))
+            current = self._summaries[-1][1]
+            merged, _ = merge_summaries(
+                [self._closed, (dict(current.counters), current.floor)], self.capacity)
+            total = self._closed_total + current.total
+
+        entries = heapq.nlargest(n, merged.items(), key=lambda entry: entry[1][0])
+        return [{'item': item, 'count': count, 'error': error} for item, (count, error) in entries], total
+
+
+@contextmanager
+def directory_lock(directory, shared):
+    """flock on '<directory>/archive.lock': shared for readers, exclusive for archiving."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, 'archive.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SharedTopK:
+    """
+    A WindowedTopK merged across the worker processes sharing a directory.
+
+    Each worker writes its per-bucket summaries to '<name>_<pid>.json' at most
+    once per interval (atomically, via rename); reads merge every worker's
+    buckets still inside the window with merge_summaries, so the result has
+    the same error guarantees as a single tracker. The merged answer is reused
+    for interval seconds. Without a directory, the local tracker answers alone.
+
+    Args:
+        tracker: This process's WindowedTopK
+        directory: Shared directory (default: PROMETHEUS_MULTIPROC_DIR, read on use)
+        name: File name prefix
+        interval: Seconds between publishes and between merged reads
+    """
+
+    def __init__(self, tracker, directory=None, name='topk_countries', interval=TOPK_SHARE_INTERVAL):
+        self.tracker = tracker
+        self._directory = directory
+        self.name = name
+        self.interval = interval
+        self._next_publish = 0.0
+        self._cached = None  # (expires_at, directory, entries, total)
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return self._directory or os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'{self.name}_{pid}.json')
+
+    def maybe_publish(self, now=None):
+        """Write this worker's summaries if the interval has passed (cheap otherwise)."""
+        now = time.time() if now is None else now
+        if now >= self._next_publish and self.directory:
+            self.publish(now)
+
+    def publish(self, now=None):
+        """Write this worker's summaries now."""
+        now = time.time() if now is None else now
+        self._next_publish = now + self.interval
+        directory = self.directory
+        if not directory:
+            return
+        path = self._path(os.getpid())
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.tracker.summaries(now), f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    def top(self, n, now=None):
+        """Top n items across every worker (see WindowedTopK.top)."""
+        now = time.time() if now is None else now
+        directory = self.directory
+        if not directory:
+            return self.tracker.top(n, now)
+
+        with self._lock:
+            cached = self._cached
+            if cached is None or cached[0] <= now or cached[1] != directory:
+                self.publish(now)
+                (merged, _), total = self._merge(now)
+                entries = heapq.nlargest(self.tracker.capacity, merged.items(), key=lambda entry: entry[1][0])
+                cached = self._cached = (now + self.interval, directory, entries, total)
+        entries, total = cached[2][:n], cached[3]
+        return [{'item': item, 'count': count, 'error': error} for item, (count, error) in entries], total
+
+    def _merge(self, now):
+        oldest = int(now // self.tracker.bucket_seconds) - self.tracker.buckets
+        summaries = []
+        total = 0
+        with directory_lock(self.directory, shared=True):
+            for path in glob.glob(os.path.join(self.directory, f'{self.name}_*.json')):
+                try:
+                    with open(path) as f:
+                        buckets = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                for bucket, counters, floor, bucket_total in buckets:
+                    if bucket > oldest:
+                        summaries.append((counters, floor))
+                        total += bucket_total
+        return merge_summaries(summaries, self.tracker.capacity), total
+
+    def archive(self, pid, now=None):
+        """
+        Fold a dead worker's summaries into '<name>_archive.json' and delete its file
+        (called from the gunicorn master's child_exit).
+        """
+        directory = self.directory
+        if not directory:
+            return
+        now = time.time() if now is None else now
+        oldest = int(now // self.tracker.bucket_seconds) - self.tracker.buckets
+        dead_path = self._path(pid)
+        archive_path = self._path('archive')
+
+        with directory_lock(directory, shared=False):
+            if not os.path.exists(dead_path):
+                return
+            by_bucket = {}
+            for path in (archive_path, dead_path):
+                try:
+                    with open(path) as f:
+                        buckets = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                for bucket, counters, floor, total in buckets:
+                    if bucket > oldest:
+                        by_bucket.setdefault(bucket, []).append((counters, floor, total))
+
+            archived = []
+            for bucket in sorted(by_bucket):
+                parts = by_bucket[bucket]
+                counters, floor = merge_summaries([(c, f) for c, f, _ in parts], self.tracker.capacity)
+                archived.append((bucket, counters, floor, sum(t for _, _, t in parts)))
+
+            tmp = f'{archive_path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(archived, f, separators=(',', ':'))
+            os.replace(tmp, archive_path)
+            os.remove(dead_path)
+
+
+class LocalMetricsStore:
+    """
+    Request metrics in fixed-size rings, one per resolution tier.
+
+    Args:
+        tiers: (bucket seconds, slots) pairs, finest first
+    """
+
+    def __init__(self, tiers=TIERS):
+        self.rings = [RingBuffer(resolution, slots) for resolution, slots in tiers]
+        self.countries = WindowedTopK()
+        self.shared_countries = SharedTopK(self.countries)
+        self.app = None  # set by setup_telemetry; labels local answers
+        self._lock = threading.Lock()
+
+    def record(self, status_code, duration, country=None, now=None):
+        now = time.time() if now is None else now
+        if country is not None:
+            self.countries.add(country, now)
+            self.shared_countries.maybe_publish(now)
+        status = STATUS + min(max(status_code // 100, 1), 5) - 1
+        le = LE + bisect.bisect_left(DURATION_BUCKETS, duration)
+        with self._lock:
+            for ring in self.rings:
+                bucket = int(now // ring.resolution)
+                ring.advance(bucket)
+                if bucket <= ring.head - ring.slots:
+                    continue
+                i = bucket % ring.slots
+                columns = ring.columns
+                columns[REQUESTS][i] += 1
+                columns[status][i] += 1
+                columns[DURATION_SUM][i] += duration
+                columns[le][i] += 1
+
+    def _ring_for(self, window):
+        for ring in self.rings:
+            if window <= ring.span:
+                return ring
+        return self.rings[-1]
+
+    def summary(self, window, now=None):
+        """
+        Aggregate the last window seconds.
+
+        Returns:
+            {'requests', 'request_rate' (per second), 'response_time_p95' (ms or None),
+             'error_rate' (percent of 5xx or None)}
+        """
+        now = time.time() if now is None else now
+        ring = self._ring_for(window)
+        window = min(window, ring.span)
+        with self._lock:
+            ring.advance(int(now // ring.resolution))
+            totals = ring.totals(math.ceil(window / ring.resolution))
+
+        requests = totals[REQUESTS]
+        p95 = quantile(0.95, totals[LE:])
+        return {
+            'requests': int(requests),
+            'request_rate': requests / window,
+            'response_time_p95': p95 * 1000 if p95 is not None else None,
+            'error_rate': totals[STATUS + 4] / requests * 100 if requests else None,
+        }
+
+    def series(self, window, now=None):
+        """
+        Per-bucket rate and p95 from the coarsest ring, completed buckets only.
+
+        Returns:
+            List of (bucket end timestamp, requests per second, p95 ms or None), oldest first
+        """
+        now = time.time() if now is None else now
+        ring = self.rings[-1]
+        current = int(now // ring.resolution)
+        count = min(int(window // ring.resolution), ring.slots - 1)
+        with self._lock:
+            ring.advance(current)
+            indices = [(current - n) % ring.slots for n in range(count, 0, -1)]
+            rows = [[column[i] for column in ring.columns] for i in indices]
+
+        points = []
+        for n, row in zip(range(count, 0, -1), rows):
+            end = (current - n + 1) * ring.resolution
+            p95 = quantile(0.95, row[LE:])
+            points.append((end, row[REQUESTS] / ring.resolution, p95 * 1000 if p95 is not None else None))
+        return points
+
+
+# One store per process, fed by telemetry_middleware
+local_metrics = LocalMetricsStore()
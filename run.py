@@ -1,7 +1,10 @@
 from flask import Flask
 from app.routes.main import main_bp  # this assumes `app/` is a package
 from app.routes.metrics_api import metrics_api_bp  # Metrics API for monitoring dashboard
+from app.routes.downloads import downloads_bp
+from app import static_assets
 from telemetry_middleware import setup_telemetry
+from log_pipeline import ManagedFileHandler
 import os
 import logging
 
@@ -10,22 +13,22 @@ def create_app():
     app.static_folder = 'app/static'
     app.register_blueprint(main_bp)
     app.register_blueprint(metrics_api_bp)  # Register metrics API
+    app.register_blueprint(downloads_bp)  # Resumable PDF downloads
+    static_assets.init_app(app)  # Fingerprinted, precompressed /assets URLs
 
     # Persist logs to file for Promtail ingestion.
     logs_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'logs'))
     os.makedirs(logs_dir, exist_ok=True)
     log_path = os.path.join(logs_dir, 'app.log')
-    root_logger = logging.getLogger()
-    if not any(getattr(h, 'baseFilename', None) == log_path for h in root_logger.handlers):
-        file_handler = logging.FileHandler(log_path)
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(
-            logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        )
-        root_logger.addHandler(file_handler)
+    # Rotated, gzipped and size-capped; safe with several workers on one file
+    file_handler = ManagedFileHandler(log_path)
+    file_handler.setLevel(logging.INFO)
+    file_handler.setFormatter(
+        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    )
 
-    # Add telemetry
-    setup_telemetry(app, app_name='portfolio')
+    # Add telemetry (installs the queued log pipeline writing to stderr and the file)
+    setup_telemetry(app, app_name='portfolio', log_handlers=[file_handler])
 
     return app
 
@@ -33,4 +36,5 @@ def create_app():
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server only; production runs gunicorn (see gunicorn.conf.py)
+    app.run(debug=os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes'))
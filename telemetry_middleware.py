@@ -4,10 +4,23 @@ Production-Grade Telemetry Middleware for Flask Applications
 Features:
 - Prometheus metrics (request count, duration, errors)
 - IP anonymization (SHA256 + salt)
-- Structured JSON logging
+- Structured JSON logging, written by a background thread (see log_pipeline)
+- Request-log sampling with per-route rules and periodic summaries of suppressed requests
 - Privacy-aware (no PII collection)
 - Cloudflare headers integration
 - Low overhead (<2ms per request)
+- In-process ring-buffer copy of request metrics (see metrics_store), so the
+  dashboard can answer without Prometheus
+- Bounded label cardinality: unregistered routes become 'unmatched', countries
+  outside the top N become 'other', and each metric has a series budget
+- Multi-process mode for gunicorn: set PROMETHEUS_MULTIPROC_DIR and /metrics
+  aggregates every worker's metrics (see gunicorn.conf.py); dead workers'
+  counters and histograms are merged into archive files
+- /metrics negotiates OpenMetrics, honors Accept-Encoding: gzip and can reuse
+  a serialized snapshot for TELEMETRY_METRICS_CACHE_TTL seconds
+- Per-phase request timing (middleware, template rendering, upstream calls and
+  any `with phase('name'):` block) in a Server-Timing header and the
+  http_request_phase_seconds histogram
 
 Usage:
     from telemetry_middleware import setup_telemetry
@@ -16,16 +29,32 @@ Usage:
     setup_telemetry(app, app_name='myapp')
 
     # Metrics endpoint is automatically added at /metrics
+
+    # Time part of a request as a named phase
+    with phase('weather'):
+        weather = weather_cache.get()
 """
 
-from flask import Flask, request, g
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CollectorRegistry, CONTENT_TYPE_LATEST
+from flask import Flask, request, g, has_request_context, before_render_template, template_rendered
+from prometheus_client import Counter, Histogram, Gauge, generate_latest, CollectorRegistry
+from prometheus_client import multiprocess
+from prometheus_client.exposition import choose_encoder, gzip_accepted
+from prometheus_client.mmap_dict import MmapedDict
+import gzip
 import hashlib
 import os
 import time
 import logging
 import json
+import random
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 from pythonjsonlogger import jsonlogger
+import log_pipeline
+from metrics_store import directory_lock, local_metrics
 
 # Create Prometheus registry
 registry = CollectorRegistry()
@@ -50,7 +79,9 @@ http_requests_in_flight = Gauge(
     'http_requests_in_flight',
     'Number of HTTP requests currently being processed',
     ['app'],
-    registry=registry
+    registry=registry,
+    # Summed over live workers in multi-process mode; dead workers' files are removed
+    multiprocess_mode='livesum'
 )
 
 http_errors_total = Counter(
@@ -60,6 +91,28 @@ http_errors_total = Counter(
     registry=registry
 )
 
+telemetry_label_sets_collapsed_total = Counter(
+    'telemetry_label_sets_collapsed_total',
+    'Request label sets collapsed to keep metric cardinality bounded (country, method, budget)',
+    ['reason'],
+    registry=registry
+)
+
+http_request_phase_seconds = Histogram(
+    'http_request_phase_seconds',
+    'Time spent in each phase of an HTTP request in seconds',
+    ['phase', 'app'],
+    # Finer low end than request duration: middleware phases are sub-millisecond
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+    registry=registry
+)
+
+log_records_dropped_total = Counter(
+    'log_records_dropped_total',
+    'Log records discarded because the log queue was full',
+    registry=registry
+)
+
 # Business metrics (optional)
 user_actions_total = Counter(
     'user_actions_total',
@@ -69,29 +122,364 @@ user_actions_total = Counter(
 )
 
 
+def multiprocess_enabled() -> bool:
+    """True when metrics are mmap-backed files shared by several worker processes."""
+    return bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+
+# Seconds a serialized /metrics body is reused (0: serialize on every scrape)
+METRICS_SNAPSHOT_TTL = float(os.getenv('TELEMETRY_METRICS_CACHE_TTL', 0))
+
+
+def collect_metrics(encoder=generate_latest, source=None) -> bytes:
+    """Serialize metrics with encoder, aggregating all workers in multi-process mode."""
+    if multiprocess_enabled():
+        # A fresh registry per scrape: the collector reads every worker's files
+        scrape_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(scrape_registry)
+        # Shared lock: never read a dead worker's file while it is being archived
+        with directory_lock(os.environ['PROMETHEUS_MULTIPROC_DIR'], shared=True):
+            return encoder(scrape_registry)
+    return encoder(source or registry)
+
+
+class MetricsExposition:
+    """
+    /metrics responses: format negotiation, gzip and an optional snapshot.
+
+    The Accept header picks Prometheus text or OpenMetrics (prometheus_client's
+    choose_encoder). With a ttl, each format is serialized at most once per ttl
+    and concurrent scrapes wait for that one serialization instead of each
+    walking the registry.
+
+    Args:
+        ttl: Seconds a serialized body is reused (0 disables the snapshot)
+        source: Registry to expose (default: the telemetry registry)
+    """
+
+    def __init__(self, ttl: float = METRICS_SNAPSHOT_TTL, source=None):
+        self.ttl = ttl
+        self.source = source
+        self._snapshots = {}  # content type -> [expires_at, body, gzipped body or None]
+        self._lock = threading.Lock()
+
+    def render(self, accept: str = None, accept_encoding: str = None) -> tuple:
+        """
+        Returns:
+            (body, headers) ready to send
+        """
+        encoder, content_type = choose_encoder(accept or '')
+        use_gzip = gzip_accepted(accept_encoding or '')
+        headers = {'Content-Type': content_type, 'Vary': 'Accept, Accept-Encoding'}
+        if use_gzip:
+            headers['Content-Encoding'] = 'gzip'
+
+        if self.ttl <= 0:
+            body = collect_metrics(encoder, self.source)
+            return (gzip.compress(body, compresslevel=6) if use_gzip else body), headers
+
+        with self._lock:
+            snapshot = self._snapshots.get(content_type)
+            if snapshot is None or snapshot[0] <= time.monotonic():
+                snapshot = [time.monotonic() + self.ttl, collect_metrics(encoder, self.source), None]
+                self._snapshots[content_type] = snapshot
+            if not use_gzip:
+                return snapshot[1], headers
+            if snapshot[2] is None:
+                snapshot[2] = gzip.compress(snapshot[1], compresslevel=6)
+            return snapshot[2], headers
+
+
+def reset_multiprocess_dir():
+    """Delete metric files left by a previous run (call once, before workers start)."""
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(('.db', '.json')):
+            os.remove(os.path.join(path, name))
+
+
+# Metric types whose dead-worker files are folded into '<type>_archive.db'
+ARCHIVED_TYPES = ('counter', 'histogram', 'summary')
+
+
+def mark_worker_dead(pid: int):
+    """
+    Clean up after a dead worker (called from the gunicorn master's child_exit).
+
+    Live gauge files are dropped so 'livesum' gauges stop counting it. Counter,
+    histogram and summary files are added into one archive file per type and
+    deleted, so totals survive worker recycling while the number of files a
+    scrape reads stays bounded by the live workers. The worker's top-k country
+    summaries are archived likewise (see metrics_store.SharedTopK).
+    """
+    if not multiprocess_enabled():
+        return
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    multiprocess.mark_process_dead(pid, path)
+
+    with directory_lock(path, shared=False):
+        for typ in ARCHIVED_TYPES:
+            dead = os.path.join(path, f'{typ}_{pid}.db')
+            if not os.path.exists(dead):
+                continue
+            archive = MmapedDict(os.path.join(path, f'{typ}_archive.db'))
+            try:
+                for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(dead):
+                    total, _ = archive.read_value(key)
+                    archive.write_value(key, total + value, timestamp)
+            finally:
+                archive.close()
+            os.remove(dead)
+
+    # Its share of the top countries is kept the same way
+    local_metrics.shared_countries.archive(pid)
+
+
+# Cardinality governor: label values that cannot grow without bound
+UNMATCHED_ROUTE = 'unmatched'
+OVERFLOW_LABEL = 'other'
+KNOWN_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+SERIES_BUDGET = int(os.getenv('TELEMETRY_SERIES_BUDGET', 2000))
+TOP_COUNTRIES = int(os.getenv('TELEMETRY_TOP_COUNTRIES', 20))
+COUNTRY_REFRESH_INTERVAL = 60
+COUNTRY_LABEL_HEADROOM = 2
+
+_COUNTRY_RE = re.compile(r'^[A-Z0-9]{2}$')
+
+
+class CountryLabels:
+    """
+    Country label values limited to the busiest countries.
+
+    The first top_n countries seen are admitted; after that, a country is
+    admitted only while it is in the local top-k tracker (re-read every
+    refresh_interval). Admission is sticky, since an emitted series lives in
+    the scrape output for the rest of the process anyway, and capped at
+    max_labels, so rotating traffic cannot grow the series count without bound.
+    Everything else is 'other'.
+
+    Args:
+        top_n: Countries kept as their own label value
+        tracker: WindowedTopK fed with every request's country
+        refresh_interval: Seconds between re-reads of the top-k
+        max_labels: Most distinct countries ever emitted (default: top_n * COUNTRY_LABEL_HEADROOM)
+    """
+
+    def __init__(self, top_n: int = TOP_COUNTRIES, tracker=None, refresh_interval: float = COUNTRY_REFRESH_INTERVAL,
+                 max_labels: int = None):
+        self.top_n = top_n
+        self.tracker = tracker or local_metrics.countries
+        self.refresh_interval = refresh_interval
+        self.max_labels = max_labels or top_n * COUNTRY_LABEL_HEADROOM
+        self._emitted = set()
+        self._top = set()
+        self._next_refresh = 0.0
+
+    def label(self, country: str) -> str:
+        if country in self._emitted:
+            return country
+        now = time.monotonic()
+        if now >= self._next_refresh:
+            self._next_refresh = now + self.refresh_interval
+            entries, _ = self.tracker.top(self.top_n)
+            self._top = {entry['item'] for entry in entries}
+        if len(self._emitted) < self.max_labels and (len(self._emitted) < self.top_n or country in self._top):
+            self._emitted.add(country)
+            return country
+        telemetry_label_sets_collapsed_total.labels(reason='country').inc()
+        return OVERFLOW_LABEL
+
+
+class RequestMetrics:
+    """
+    Request metric children bound once per label combination, within a series budget.
+
+    Calling .labels() validates and looks up label values under the metric's lock
+    on every call; the hot path instead does one dict lookup per request and
+    records straight into the cached children.
+
+    The cached keys are http_requests_total's label sets, the finest of the three
+    metrics, so capping them at series_budget caps every metric's series count.
+    Past the budget, new label sets are recorded with route and country 'other'.
+    """
+
+    def __init__(self, app_name: str, requests=None, duration=None, errors=None, local=None,
+                 series_budget: int = SERIES_BUDGET, countries: CountryLabels = None):
+        self.app_name = app_name
+        self.requests = requests or http_requests_total
+        self.duration = duration or http_request_duration_seconds
+        self.errors = errors or http_errors_total
+        self.local = local or local_metrics
+        self.series_budget = series_budget
+        self.countries = countries or CountryLabels(tracker=self.local.countries)
+        self._children = {}  # (method, route, status_code, country) -> (requests, duration, errors)
+
+    def children(self, method: str, route: str, status_code: int, country: str) -> tuple:
+        key = (method, route, status_code, country)
+        children = self._children.get(key)
+        if children is None:
+            if len(self._children) >= self.series_budget:
+                telemetry_label_sets_collapsed_total.labels(reason='budget').inc()
+                key = (method, OVERFLOW_LABEL, status_code, OVERFLOW_LABEL)
+                children = self._children.get(key)
+                if children is not None:
+                    return children
+            status = str(status_code)
+            method, route, _, country = key
+            errors = None
+            if status_code >= 400:
+                error_type = 'server_error' if status_code >= 500 else 'client_error'
+                errors = self.errors.labels(method, route, status, self.app_name, error_type)
+            # Overflow keys may take the cache a little past the budget: at most one per method and status
+            children = self._children.setdefault(key, (
+                self.requests.labels(method, route, status, self.app_name, country),
+                self.duration.labels(method, route, status, self.app_name),
+                errors,
+            ))
+        return children
+
+    def record(self, method: str, route: str, status_code: int, country: str, duration: float):
+        self.local.record(status_code, duration, country)
+
+        if method not in KNOWN_METHODS:
+            telemetry_label_sets_collapsed_total.labels(reason='method').inc()
+            method = OVERFLOW_LABEL
+        requests, duration_child, errors = self.children(method, route, status_code, self.countries.label(country))
+        requests.inc()
+        duration_child.observe(duration)
+        if errors is not None:
+            errors.inc()
+
+
+# Salt is read once (at setup_telemetry or first use), not per request
+_ip_salt = None
+
+IP_HASH_CACHE_SIZE = 4096
+IP_HASH_CACHE_TTL = 3600
+
+
+class _TTLCache:
+    """Small LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_ip_hash_cache = _TTLCache(IP_HASH_CACHE_SIZE, IP_HASH_CACHE_TTL)
+
+
+def configure_ip_salt(salt: str = None):
+    """Set the IP hashing salt (default: IP_SALT environment variable)."""
+    global _ip_salt
+    _ip_salt = salt if salt is not None else os.getenv('IP_SALT', 'change-this-salt-in-production-2026')
+    _ip_hash_cache.clear()
+
+
 def anonymize_ip(ip: str) -> str:
     """Anonymize IP address using SHA256 hash with salt."""
-    salt = os.getenv('IP_SALT', 'change-this-salt-in-production-2026')
-    return hashlib.sha256(f"{ip}{salt}".encode()).hexdigest()[:16]
+    ip_hash = _ip_hash_cache.get(ip)
+    if ip_hash is None:
+        if _ip_salt is None:
+            configure_ip_salt()
+        ip_hash = hashlib.sha256(f"{ip}{_ip_salt}".encode()).hexdigest()[:16]
+        _ip_hash_cache.put(ip, ip_hash)
+    return ip_hash
 
 
 def get_route_pattern(request):
     """Get route pattern (not full path) to avoid high cardinality."""
-    if request.endpoint:
-        # Use Flask endpoint (e.g., 'main.index', 'api.users')
-        return request.endpoint
+    # Flask endpoint (e.g., 'main.index', 'api.users'); 404s and 405s have none,
+    # and their raw paths (scanner probes) would each create a new series
+    return request.endpoint or UNMATCHED_ROUTE
 
-    # Fallback to path
-    path = request.path
 
-    # Replace UUIDs with :id
-    import re
-    path = re.sub(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', ':id', path, flags=re.IGNORECASE)
+# Server-Timing headers on every response (set to 0 to keep phase timings internal)
+SERVER_TIMING = os.getenv('TELEMETRY_SERVER_TIMING', '1').lower() not in ('0', 'false', 'no')
 
-    # Replace numeric IDs with :id
-    path = re.sub(r'/\d+', '/:id', path)
 
-    return path
+def record_phase(name: str, seconds: float):
+    """Add seconds to a phase of the current request; ignored outside a request (e.g. background threads)."""
+    if not has_request_context():
+        return
+    timings = g.setdefault('phase_timings', {})
+    timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as a named request phase; repeated phases add up."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def server_timing_header(timings: dict, total: float = None) -> str:
+    """Format phase seconds as a Server-Timing header value (milliseconds)."""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
+
+
+# User-agent tokens in priority order: Edge and Opera UAs also contain 'Chrome/',
+# Chrome UAs contain 'Safari/', iOS UAs contain 'Mac OS X' and Android UAs 'Linux'
+_BROWSER_TOKENS = [
+    ('Edg/', 'Edge'),
+    ('OPR/', 'Opera'),
+    ('Firefox/', 'Firefox'),
+    ('Chrome/', 'Chrome'),
+    ('Safari/', 'Safari'),
+]
+
+_OS_TOKENS = [
+    ('iPhone', 'iOS'),
+    ('iPad', 'iOS'),
+    ('Android', 'Android'),
+    ('Windows NT', 'Windows'),
+    ('Mac OS X', 'macOS'),
+    ('Linux', 'Linux'),
+]
+
+# One scan of the UA string finds every known token
+_UA_TOKEN_RE = re.compile('|'.join(re.escape(token) for token, _ in _BROWSER_TOKENS + _OS_TOKENS))
+
+
+@lru_cache(maxsize=1024)
+def _classify_user_agent(ua: str) -> tuple:
+    found = set(_UA_TOKEN_RE.findall(ua))
+    browser = next((name for token, name in _BROWSER_TOKENS if token in found), 'unknown')
+    os_name = next((name for token, name in _OS_TOKENS if token in found), 'unknown')
+    return browser, os_name
 
 
 def parse_user_agent(ua: str) -> dict:
@@ -100,60 +488,182 @@ def parse_user_agent(ua: str) -> dict:
         return {'browser': 'unknown', 'os': 'unknown'}
 
     # Simple parser (consider using 'user-agents' package for production)
-    browsers = {
-        'Chrome': 'Chrome/',
-        'Firefox': 'Firefox/',
-        'Safari': 'Safari/',
-        'Edge': 'Edg/',
-        'Opera': 'OPR/'
-    }
-
-    oses = {
-        'Windows': 'Windows NT',
-        'macOS': 'Mac OS X',
-        'Linux': 'Linux',
-        'Android': 'Android',
-        'iOS': 'iPhone|iPad'
-    }
-
-    browser = next((b for b, pattern in browsers.items() if pattern in ua), 'unknown')
-    os_name = next((o for o, pattern in oses.items() if pattern in ua), 'unknown')
+    browser, os_name = _classify_user_agent(ua)
 
     return {'browser': browser, 'os': os_name}
 
 
-def setup_telemetry(app: Flask, app_name: str = None):
+# Request-log sampling rules, first matching path glob wins:
+#   sample: fraction of successful (<400) requests logged
+#   errors: fraction of 4xx/5xx requests logged (default: 1.0)
+# Requests that are not logged are rolled up into periodic summary records.
+DEFAULT_LOG_RULES = [
+    {'path': '/metrics', 'sample': 0.0, 'errors': 0.0},
+    {'path': '/health', 'sample': 0.0, 'errors': 0.0},
+    {'path': '/api/metrics/*', 'sample': 0.01},
+    {'path': '/static/*', 'sample': 0.01},
+]
+
+
+class LogSampler:
+    """
+    Decide which requests get a log record and summarize the rest.
+
+    Args:
+        rules: List of {'path': glob, 'sample': float, 'errors': float} (default: DEFAULT_LOG_RULES)
+        summary_interval: Seconds between summary records for suppressed requests
+    """
+
+    def __init__(self, rules=None, summary_interval=60):
+        self.rules = [
+            (re.compile(_glob_to_regex(rule['path'])), float(rule.get('sample', 1.0)), float(rule.get('errors', 1.0)))
+            for rule in (DEFAULT_LOG_RULES if rules is None else rules)
+        ]
+        self.summary_interval = summary_interval
+        self._lock = threading.Lock()
+        self._suppressed = {}  # (route, status class) -> [count, total seconds, max seconds]
+        self._window_start = time.time()
+
+    def should_log(self, path: str, status_code: int) -> bool:
+        """Return True when this request should get its own log record."""
+        for pattern, sample, errors in self.rules:
+            if pattern.match(path):
+                rate = errors if status_code >= 400 else sample
+                return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+        return True
+
+    def suppress(self, route: str, status_code: int, duration: float):
+        """Count a request that was not logged individually."""
+        key = (route, f"{status_code // 100}xx")
+        with self._lock:
+            totals = self._suppressed.get(key)
+            if totals is None:
+                self._suppressed[key] = [1, duration, duration]
+            else:
+                totals[0] += 1
+                totals[1] += duration
+                if duration > totals[2]:
+                    totals[2] = duration
+
+    def flush_due(self, now: float = None):
+        """
+        Return summary dicts for the finished window, or [] if the window is still open.
+        """
+        now = time.time() if now is None else now
+        if now - self._window_start < self.summary_interval:
+            return []
+
+        with self._lock:
+            suppressed, self._suppressed = self._suppressed, {}
+            window_start, self._window_start = self._window_start, now
+
+        return [
+            {
+                'route': route,
+                'status_class': status_class,
+                'count': count,
+                'total_duration_ms': round(total * 1000, 2),
+                'avg_duration_ms': round(total * 1000 / count, 2),
+                'max_duration_ms': round(peak * 1000, 2),
+                'window_seconds': round(now - window_start, 1)
+            }
+            for (route, status_class), (count, total, peak) in suppressed.items()
+        ]
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a path glob ('*' matches anything) into a regex anchored at both ends."""
+    return '^' + '.*'.join(re.escape(part) for part in pattern.split('*')) + '$'
+
+
+def _load_log_rules():
+    """Read sampling rules from TELEMETRY_LOG_RULES (JSON list), if set."""
+    raw = os.getenv('TELEMETRY_LOG_RULES')
+    return json.loads(raw) if raw else None
+
+
+def setup_telemetry(app: Flask, app_name: str = None, log_handlers: list = None, log_rules: list = None):
     """
     Set up telemetry middleware for Flask app.
 
     Args:
         app: Flask application instance
         app_name: Name of the application (e.g., 'app1', 'app2')
+        log_handlers: Extra log destinations (e.g. a file handler) fed by the log pipeline
+        log_rules: Request-log sampling rules (default: TELEMETRY_LOG_RULES or DEFAULT_LOG_RULES)
     """
     if app_name is None:
         app_name = os.getenv('APP_NAME', 'flask-app')
 
+    configure_ip_salt()
+
+    sampler = LogSampler(
+        log_rules if log_rules is not None else _load_log_rules(),
+        summary_interval=float(os.getenv('TELEMETRY_LOG_SUMMARY_INTERVAL', 60))
+    )
+
     # Set up JSON logging
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
-    # Remove existing handlers
-    logger.handlers = []
-
     logHandler = logging.StreamHandler()
     formatter = jsonlogger.JsonFormatter()
     logHandler.setFormatter(formatter)
-    logger.addHandler(logHandler)
+
+    # Replaces existing handlers: request threads only enqueue, a background thread writes
+    log_pipeline.install([logHandler] + list(log_handlers or []), logger=logger,
+                         on_drop=log_records_dropped_total.inc)
+
+    request_metrics = RequestMetrics(app_name)
+    local_metrics.app = app_name
+    in_flight = http_requests_in_flight.labels(app=app_name)
+    phase_children = {}
+
+    def render_started(sender, template, context, **extra):
+        g.setdefault('render_started', []).append(time.perf_counter())
+
+    def render_finished(sender, template, context, **extra):
+        started = g.get('render_started')
+        if started:
+            record_phase('render', time.perf_counter() - started.pop())
+
+    # Strong references: these closures are not kept alive anywhere else
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
 
     @app.before_request
     def before_request():
         """Start timer and increment in-flight requests."""
+        started = time.perf_counter()
         g.start_time = time.time()
-        http_requests_in_flight.labels(app=app_name).inc()
+        g.phase_timings = {}
+        in_flight.inc()
+        record_phase('middleware', time.perf_counter() - started)
+
+    # Registered before after_request, so Flask runs it afterwards
+    @app.after_request
+    def report_phases(response):
+        """Close the middleware phase, record every phase and add Server-Timing."""
+        timings = g.get('phase_timings')
+        if timings is None:
+            return response
+        record_phase('middleware', time.perf_counter() - g.after_started)
+
+        for name, seconds in timings.items():
+            child = phase_children.get(name)
+            if child is None:
+                child = phase_children[name] = http_request_phase_seconds.labels(phase=name, app=app_name)
+            child.observe(seconds)
+
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = server_timing_header(timings, time.time() - g.start_time)
+        return response
 
     @app.after_request
     def after_request(response):
         """Record metrics and log request."""
+        g.after_started = time.perf_counter()
+
         # Calculate duration
         duration = time.time() - g.start_time
 
@@ -162,9 +672,26 @@ def setup_telemetry(app: Flask, app_name: str = None):
         route = get_route_pattern(request)
         status_code = response.status_code
 
-        # Cloudflare headers
-        cf_connecting_ip = request.headers.get('CF-Connecting-IP') or request.remote_addr
+        # Cloudflare headers; anything but a two-character code is spoofed or junk
         country = request.headers.get('CF-IPCountry', 'unknown')
+        if country != 'unknown' and not _COUNTRY_RE.match(country):
+            telemetry_label_sets_collapsed_total.labels(reason='country').inc()
+            country = OVERFLOW_LABEL
+
+        # Record Prometheus metrics
+        request_metrics.record(method, route, status_code, country, duration)
+        in_flight.dec()
+
+        # Summaries of suppressed requests go out once per window
+        for summary in sampler.flush_due():
+            logger.info('HTTP request summary', extra=dict(summary, app=app_name, log_type='request_summary'))
+
+        # Sampled-out requests are only counted, skipping IP hashing and UA parsing
+        if not sampler.should_log(request.path, status_code):
+            sampler.suppress(route, status_code, duration)
+            return response
+
+        cf_connecting_ip = request.headers.get('CF-Connecting-IP') or request.remote_addr
         user_agent = request.headers.get('User-Agent', '')
         referer = request.headers.get('Referer') or request.headers.get('Referrer', 'direct')
 
@@ -174,36 +701,6 @@ def setup_telemetry(app: Flask, app_name: str = None):
         # Parse user agent
         ua_info = parse_user_agent(user_agent)
 
-        # Record Prometheus metrics
-        http_requests_total.labels(
-            method=method,
-            route=route,
-            status_code=str(status_code),
-            app=app_name,
-            country=country
-        ).inc()
-
-        http_request_duration_seconds.labels(
-            method=method,
-            route=route,
-            status_code=str(status_code),
-            app=app_name
-        ).observe(duration)
-
-        # Track errors
-        if status_code >= 400:
-            error_type = 'server_error' if status_code >= 500 else 'client_error'
-            http_errors_total.labels(
-                method=method,
-                route=route,
-                status_code=str(status_code),
-                app=app_name,
-                error_type=error_type
-            ).inc()
-
-        # Decrement in-flight requests
-        http_requests_in_flight.labels(app=app_name).dec()
-
         # Structured logging
         log_level = 'error' if status_code >= 500 else 'warn' if status_code >= 400 else 'info'
 
@@ -232,10 +729,13 @@ def setup_telemetry(app: Flask, app_name: str = None):
 
         return response
 
+    exposition = MetricsExposition()
+
     @app.route('/metrics')
     def metrics():
-        """Prometheus metrics endpoint."""
-        return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+        """Prometheus metrics endpoint (text or OpenMetrics, optionally gzipped)."""
+        body, headers = exposition.render(request.headers.get('Accept'), request.headers.get('Accept-Encoding'))
+        return body, 200, headers
    
     if "health" not in app.view_functions:
         @app.route('/health')
@@ -0,0 +1,96 @@
+import pytest
+
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, PROBE, CircuitBreaker
+from telemetry_middleware import registry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, name='test'):
+    return CircuitBreaker(name, threshold=0.5, min_calls=4, window=10, cooldown=30, clock=clock)
+
+
+@pytest.mark.unit
+def test_opens_at_failure_rate_threshold():
+    """Test that the circuit opens once enough calls fail and then rejects calls."""
+    breaker = make_breaker(FakeClock())
+    for outcome in (True, False, True):
+        breaker.record_failure() if outcome else breaker.record_success()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+@pytest.mark.unit
+def test_half_open_allows_one_probe():
+    """Test that after the cooldown a single probe decides between closed and open."""
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record_failure()
+
+    clock.now = 30
+    assert breaker.state == HALF_OPEN
+    probe = breaker.allow()
+    assert probe == PROBE
+    assert not breaker.allow()
+    breaker.record_failure(probe)
+    assert breaker.state == OPEN
+
+    clock.now = 60
+    probe = breaker.allow()
+    breaker.record_success(probe)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+@pytest.mark.unit
+def test_transitions_are_exported():
+    """Test that every state change increments the transition counter."""
+    clock = FakeClock()
+    breaker = make_breaker(clock, name='exported')
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now = 31
+    breaker.record_success(breaker.allow())
+
+    def transitions(from_state, to_state):
+        return registry.get_sample_value('circuit_breaker_transitions_total', {
+            'breaker': 'exported', 'from_state': from_state, 'to_state': to_state})
+
+    assert transitions(CLOSED, OPEN) == 1
+    assert transitions(OPEN, HALF_OPEN) == 1
+    assert transitions(HALF_OPEN, CLOSED) == 1
+    assert registry.get_sample_value('circuit_breaker_state', {'breaker': 'exported'}) == 0
+
+
+@pytest.mark.unit
+def test_late_outcomes_do_not_change_a_tripped_circuit():
+    """Test that calls admitted while closed cannot close or re-open the circuit after it trips."""
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    tickets = [breaker.allow() for _ in range(8)]
+    for ticket in tickets[:4]:
+        breaker.record_failure(ticket)
+    assert breaker.state == OPEN
+
+    breaker.record_success(tickets[4])
+    assert breaker.state == OPEN
+
+    clock.now = 30
+    probe = breaker.allow()
+    breaker.record_failure(tickets[5])
+    assert breaker.state == HALF_OPEN
+    breaker.record_success(tickets[6])
+    assert breaker.state == HALF_OPEN
+
+    breaker.record_success(probe)
+    assert breaker.state == CLOSED
@@ -0,0 +1,51 @@
+import pytest
+
+from telemetry_middleware import registry
+
+RESUME = '/downloads/FablihaFaiza.pdf'
+
+
+def bytes_served(name):
+    return registry.get_sample_value('file_download_bytes_total', {'file': name}) or 0
+
+
+@pytest.mark.unit
+def test_range_request_returns_partial_content(client):
+    """Test that a Range request gets 206 with only the requested bytes counted."""
+    before = bytes_served('FablihaFaiza.pdf')
+    response = client.get(RESUME, headers={'Range': 'bytes=0-3'})
+
+    assert response.status_code == 206
+    assert response.data == b'%PDF'
+    assert response.headers['Content-Range'].startswith('bytes 0-3/')
+    assert bytes_served('FablihaFaiza.pdf') - before == 4
+
+
+@pytest.mark.unit
+def test_if_range_mismatch_sends_whole_file(client):
+    """Test that a stale If-Range validator falls back to a full 200 response."""
+    full = client.get(RESUME)
+    stale = client.get(RESUME, headers={'Range': 'bytes=0-3', 'If-Range': '"stale"'})
+    resumed = client.get(RESUME, headers={'Range': 'bytes=4-', 'If-Range': full.headers['ETag']})
+
+    assert stale.status_code == 200
+    assert stale.data == full.data
+    assert resumed.status_code == 206
+    assert full.data[:4] + resumed.data == full.data
+
+
+@pytest.mark.unit
+def test_x_accel_offload_hands_file_to_proxy(client, monkeypatch):
+    """Test that nginx offload returns an empty X-Accel-Redirect response."""
+    monkeypatch.setenv('DOWNLOAD_OFFLOAD', 'x-accel')
+    response = client.get('/downloads/CKAD_Study_Guide.pdf')
+
+    assert response.headers['X-Accel-Redirect'] == '/protected/blog/CKAD_Study_Guide.pdf'
+    assert response.data == b''
+
+
+@pytest.mark.unit
+def test_only_known_files_are_downloadable(client):
+    """Test that names outside the download list are 404."""
+    assert client.get('/downloads/..%2Frun.py').status_code == 404
+    assert client.get('/downloads/other.pdf').status_code == 404
@@ -0,0 +1,92 @@
+import os
+import runpy
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = os.path.join(ROOT, 'gunicorn.conf.py')
+
+
+def load_config(monkeypatch, **env):
+    # The config exports settings for the app; keep them out of other tests
+    monkeypatch.setattr(os, 'environ', os.environ.copy())
+    for name in ('GUNICORN_WORKER_CLASS', 'GUNICORN_WORKERS', 'GUNICORN_THREADS', 'PROMETHEUS_MULTIPROC_DIR',
+                 'METRICS_STREAM_MAX_CLIENTS'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(CONFIG)
+
+
+@pytest.mark.unit
+def test_worker_defaults_follow_cpu_count(monkeypatch):
+    """Test that worker counts default per worker class from the CPU count."""
+    cpus = os.cpu_count() or 1
+
+    gthread = load_config(monkeypatch)
+    assert (gthread['worker_class'], gthread['workers'], gthread['threads']) == ('gthread', cpus, 8)
+
+    sync = load_config(monkeypatch, GUNICORN_WORKER_CLASS='sync')
+    assert (sync['workers'], sync['threads']) == (2 * cpus + 1, 1)
+
+
+@pytest.mark.unit
+def test_environment_overrides_worker_model(monkeypatch):
+    """Test that explicit environment settings win over the defaults."""
+    config = load_config(monkeypatch, GUNICORN_WORKERS='3', GUNICORN_THREADS='8')
+    assert (config['workers'], config['threads']) == (3, 8)
+    assert config['preload_app'] is True
+    assert config['max_requests_jitter'] > 0
+
+
+@pytest.mark.unit
+def test_stream_limit_leaves_threads_for_other_requests(monkeypatch):
+    """Test that SSE clients can never occupy every thread of a worker."""
+    load_config(monkeypatch)
+    assert os.environ['METRICS_STREAM_MAX_CLIENTS'] == '4'
+
+    load_config(monkeypatch, GUNICORN_THREADS='4', METRICS_STREAM_MAX_CLIENTS='20')
+    assert os.environ['METRICS_STREAM_MAX_CLIENTS'] == '3'
+
+    load_config(monkeypatch, GUNICORN_WORKER_CLASS='sync')
+    assert os.environ['METRICS_STREAM_MAX_CLIENTS'] == '0'
+
+
+@pytest.mark.slow
+def test_gunicorn_serves_preloaded_app(tmp_path):
+    """Test that gunicorn boots wsgi:app with preloaded workers and aggregated metrics."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    # A worker still booting when SIGTERM arrives misses it and is only killed
+    # after the graceful timeout, so keep that short
+    env = dict(os.environ, GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS='2',
+               GUNICORN_GRACEFUL_TIMEOUT='3', PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', CONFIG, 'wsgi:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f'http://127.0.0.1:{port}'
+        deadline = time.time() + 15
+        while True:
+            try:
+                assert requests.get(f'{url}/health', timeout=2).status_code == 200
+                break
+            except requests.ConnectionError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+
+        for _ in range(5):
+            requests.get(f'{url}/health', timeout=2)
+        metrics = requests.get(f'{url}/metrics', timeout=2).text
+        served = sum(float(line.rsplit(' ', 1)[1]) for line in metrics.splitlines()
+                     if line.startswith('http_requests_total{') and 'health' in line)
+        assert served == 6
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
@@ -0,0 +1,74 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.http_client import OutboundClient
+
+
+@pytest.fixture
+def upstream():
+    """Local HTTP server answering with queued status codes (200 once the queue is empty)."""
+    statuses = []
+    connections = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            connections.add(self.client_address)
+            status = statuses.pop(0) if statuses else 200
+            body = b'{"ok": true}'
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.statuses = statuses
+    server.connections = connections
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.unit
+def test_connections_are_reused(upstream):
+    """Test that repeated calls to one upstream share a keep-alive connection."""
+    client = OutboundClient({'stub': {'timeout': 2, 'retries': 0, 'pool_size': 1}})
+    for _ in range(5):
+        assert client.get('stub', upstream.url).status_code == 200
+    assert len(upstream.connections) == 1
+
+
+@pytest.mark.unit
+def test_retries_transient_status(upstream):
+    """Test that 503 responses are retried within the upstream's budget."""
+    client = OutboundClient({'stub': {'timeout': 2, 'retries': 2, 'pool_size': 1}}, backoff_base=0.001)
+    upstream.statuses.extend([503, 503])
+    assert client.get('stub', upstream.url).status_code == 200
+
+
+@pytest.mark.unit
+def test_gives_up_after_retry_budget(upstream):
+    """Test that the last failed response is returned once retries are exhausted."""
+    client = OutboundClient({'stub': {'timeout': 2, 'retries': 1, 'pool_size': 1}}, backoff_base=0.001)
+    upstream.statuses.extend([503, 503, 503])
+    assert client.get('stub', upstream.url).status_code == 503
+    assert upstream.statuses == [503]
+
+
+@pytest.mark.unit
+def test_connection_error_raises_after_retries():
+    """Test that connection failures surface once every attempt has failed."""
+    client = OutboundClient({'stub': {'timeout': 0.5, 'retries': 1, 'pool_size': 1}}, backoff_base=0.001)
+    with pytest.raises(requests.ConnectionError):
+        client.get('stub', 'http://127.0.0.1:9/')
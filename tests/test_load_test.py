@@ -0,0 +1,44 @@
+import pytest
+import requests
+
+from benchmarks.load_test import StubUpstream, compare, discover_routes, percentile, prometheus_response
+
+
+@pytest.mark.unit
+def test_percentile_uses_nearest_rank():
+    """Test percentiles over a known distribution."""
+    values = list(range(1, 101))
+    assert (percentile(values, 0.50), percentile(values, 0.95), percentile(values, 0.99)) == (50, 95, 99)
+    assert percentile([7], 0.99) == 7
+
+
+@pytest.mark.unit
+def test_compare_flags_only_regressions_beyond_threshold():
+    """Test that p95 growth and RPS drops beyond the threshold are reported."""
+    baseline = {'/': {'8': {'rps': 100.0, 'p95_ms': 10.0}}, '/gone': {'8': {'rps': 1.0, 'p95_ms': 1.0}}}
+    assert compare({'/': {'8': {'rps': 90.0, 'p95_ms': 11.5}}}, baseline, 0.2) == []
+
+    regressions = compare({'/': {'8': {'rps': 70.0, 'p95_ms': 13.0}}}, baseline, 0.2)
+    assert len(regressions) == 2
+
+
+@pytest.mark.unit
+def test_stub_prometheus_injects_failures():
+    """Test that the stub answers Prometheus queries and fails on demand."""
+    stub = StubUpstream(prometheus_response).start()
+    try:
+        data = requests.get(f'{stub.url}/api/v1/query', params={'query': 'up'}, timeout=5).json()
+        assert data['status'] == 'success' and data['data']['result'][0]['metric']['job']
+
+        stub.failure_rate = 1.0
+        assert requests.get(f'{stub.url}/api/v1/query', timeout=5).status_code == 503
+    finally:
+        stub.stop()
+
+
+@pytest.mark.unit
+def test_discovered_routes_cover_both_blueprints():
+    """Test that every page, API route and /metrics is driven, but not the endless stream."""
+    paths = discover_routes()
+    assert {'/', '/journey', '/api/metrics/dashboard', '/metrics'} <= set(paths)
+    assert '/api/metrics/stream' not in paths
@@ -0,0 +1,159 @@
+import gzip
+import io
+import json
+import logging
+import queue
+import time
+
+import pytest
+from pythonjsonlogger import jsonlogger
+
+import log_pipeline
+
+
+class CountingStream(io.StringIO):
+    """StringIO that counts write calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+@pytest.fixture
+def isolated_logger():
+    logger = logging.getLogger('tests.log_pipeline')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    yield logger
+    log_pipeline.shutdown()
+    logger.handlers = []
+
+
+@pytest.mark.unit
+def test_records_are_written_in_batches_on_shutdown(isolated_logger):
+    """Test that queued records are flushed with few writes when the pipeline stops."""
+    stream = CountingStream()
+    log_pipeline.install([logging.StreamHandler(stream)], logger=isolated_logger, batch_size=100)
+
+    # Hold the listener back so all records land in one batch
+    listener = log_pipeline._pipeline.listener
+    listener.stop()
+    for i in range(50):
+        isolated_logger.info('record %d', i)
+    listener.start()
+    log_pipeline.shutdown()
+
+    lines = stream.getvalue().splitlines()
+    assert lines == [f'record {i}' for i in range(50)]
+    assert stream.writes == 1
+
+
+@pytest.mark.unit
+def test_exceptions_reach_the_file_as_a_json_field(isolated_logger, tmp_path):
+    """Test that a logged traceback is its own JSON field, not folded into the message."""
+    handler = logging.FileHandler(tmp_path / 'app.log')
+    handler.setFormatter(jsonlogger.JsonFormatter())
+    log_pipeline.install([handler], logger=isolated_logger)
+
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        isolated_logger.exception('request %s failed', '/journey', extra={'route': 'main.journey'})
+    log_pipeline.shutdown()
+
+    entry = json.loads((tmp_path / 'app.log').read_text())
+    assert entry['message'] == 'request /journey failed'
+    assert entry['route'] == 'main.journey'
+    assert entry['exc_info'].startswith('Traceback') and 'ZeroDivisionError' in entry['exc_info']
+
+
+@pytest.mark.unit
+def test_full_queue_drops_and_counts():
+    """Test that the drop policy discards records without blocking."""
+    dropped = []
+    handler = log_pipeline.BoundedQueueHandler(queue.Queue(2), overflow='drop', on_drop=lambda: dropped.append(1))
+    logger = logging.getLogger('tests.log_pipeline.drop')
+    logger.propagate = False
+    logger.handlers = [handler]
+
+    for i in range(5):
+        logger.warning('record %d', i)
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    assert len(dropped) == 3
+
+
+@pytest.mark.unit
+def test_rejects_unknown_overflow_policy():
+    """Test that a misspelled overflow policy fails loudly."""
+    with pytest.raises(ValueError):
+        log_pipeline.BoundedQueueHandler(queue.Queue(1), overflow='wait')
+
+
+def make_record(message):
+    return logging.LogRecord('tests', logging.INFO, __file__, 0, message, None, None)
+
+
+def wait_for_segments(log_dir, pattern, count, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        segments = sorted(log_dir.glob(pattern))
+        if len(segments) >= count:
+            return segments
+        time.sleep(0.01)
+    return sorted(log_dir.glob(pattern))
+
+
+@pytest.mark.unit
+def test_managed_file_rotates_and_compresses(tmp_path):
+    """Test that the active file stays under max_bytes and rotated segments are gzipped."""
+    path = tmp_path / 'app.log'
+    handler = log_pipeline.ManagedFileHandler(str(path), max_bytes=200, retention_bytes=10 ** 6, compress=True)
+
+    for i in range(20):
+        handler.emit_batch([make_record(f'line {i:02d} ' + 'x' * 40)])
+    handler.close()
+
+    assert path.stat().st_size <= 200
+    segments = wait_for_segments(tmp_path, 'app.log.*.gz', 4)
+    assert len(segments) >= 4
+    with gzip.open(segments[0], 'rt') as f:
+        assert f.readline().startswith('line 00')
+
+
+@pytest.mark.unit
+def test_managed_file_retention_cap(tmp_path):
+    """Test that old segments are deleted once their total size passes the cap."""
+    path = tmp_path / 'app.log'
+    handler = log_pipeline.ManagedFileHandler(str(path), max_bytes=100, retention_bytes=250, compress=False)
+
+    for i in range(30):
+        handler.emit_batch([make_record(f'line {i:02d} ' + 'x' * 60)])
+        time.sleep(0.002)
+    handler.close()
+    time.sleep(0.2)
+
+    rotated = [p for p in tmp_path.glob('app.log.*') if not p.name.endswith('.lock')]
+    assert sum(p.stat().st_size for p in rotated) <= 250
+
+
+@pytest.mark.unit
+def test_writers_sharing_a_file_follow_rotation(tmp_path):
+    """Test that a second writer reopens the path after another one rotated it."""
+    path = tmp_path / 'app.log'
+    first = log_pipeline.ManagedFileHandler(str(path), max_bytes=150, compress=False)
+    second = log_pipeline.ManagedFileHandler(str(path), max_bytes=150, compress=False)
+
+    second.emit_batch([make_record('second before rotation')])
+    for i in range(4):
+        first.emit_batch([make_record(f'first {i} ' + 'x' * 40)])
+    second.emit_batch([make_record('second after rotation')])
+    first.close()
+    second.close()
+
+    assert 'second after rotation' in path.read_text()
@@ -0,0 +1,292 @@
+import threading
+import time
+
+import pytest
+from unittest.mock import patch
+
+from app.circuit_breaker import CircuitBreaker
+from app.routes import metrics_api
+
+
+def vector(value, **labels):
+    """Build a successful Prometheus instant-vector response."""
+    return {
+        'status': 'success',
+        'data': {
+            'resultType': 'vector',
+            'result': [{'metric': labels, 'value': [time.time(), str(value)]}]
+        }
+    }
+
+
+@pytest.mark.unit
+def test_live_queries_run_concurrently(client):
+    """Test that /api/metrics/live takes about as long as its slowest query."""
+    def slow_query(query):
+        time.sleep(0.2)
+        return vector(1, app='portfolio', job='portfolio_app')
+
+    with patch('app.routes.metrics_api.query_prometheus', side_effect=slow_query):
+        started = time.time()
+        response = client.get('/api/metrics/live')
+        elapsed = time.time() - started
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['missing'] == []
+    assert body['data']['request_rate'] == [{'app': 'portfolio', 'value': 1.0}]
+    assert body['data']['uptime'][0]['status'] == 'up'
+    assert elapsed < 0.2 * len(metrics_api.LIVE_QUERIES) / 2
+
+
+@pytest.mark.unit
+def test_system_query_past_deadline_is_missing(client):
+    """Test that a query missing the endpoint deadline is reported as missing."""
+    def query(q):
+        if 'node_memory' in q:
+            time.sleep(0.5)
+        return vector(42, instance='pi')
+
+    with patch('app.routes.metrics_api.query_prometheus', side_effect=query), \
+            patch.object(metrics_api, 'ENDPOINT_DEADLINE', 0.1):
+        response = client.get('/api/metrics/system')
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['missing'] == ['memory_usage']
+    assert body['data'] == {'cpu_usage': 42.0, 'memory_usage': 0, 'disk_usage': 42.0}
+
+
+@pytest.mark.unit
+def test_range_query_timeout_fits_within_the_endpoint_deadline():
+    """Test that a range query's read timeout never outlives the endpoint deadline."""
+    metrics_api._query_cache.clear()
+    with patch('app.routes.metrics_api.http_client.get') as upstream:
+        upstream.return_value.json.return_value = {'status': 'success', 'data': {'result': []}}
+        metrics_api.query_prometheus_range('up', 0, 60, 15)
+
+    connect, read = upstream.call_args.kwargs['timeout']
+    assert connect <= read <= metrics_api.ENDPOINT_DEADLINE
+    metrics_api._query_cache.clear()
+
+
+@pytest.mark.unit
+def test_query_cache_coalesces_concurrent_loads():
+    """Test that concurrent identical lookups share one upstream call."""
+    cache = metrics_api.QueryCache(ttl=60, max_entries=8)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return vector(1)
+
+    threads = [threading.Thread(target=cache.get_or_load, args=('up', loader)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.get_or_load('up', loader)['status'] == 'success'
+    assert len(calls) == 1
+
+
+@pytest.mark.unit
+def test_query_cache_evicts_least_recently_used():
+    """Test that the cache stays within max_entries."""
+    cache = metrics_api.QueryCache(ttl=60, max_entries=2)
+    cache.get_or_load('a', lambda: 'A')
+    cache.get_or_load('b', lambda: 'B')
+    cache.get_or_load('a', lambda: pytest.fail('a should be cached'))
+    cache.get_or_load('c', lambda: 'C')
+
+    assert cache.get_or_load('b', lambda: 'B2') == 'B2'
+    assert cache.get_or_load('a', lambda: 'A2') == 'A2'
+
+
+@pytest.mark.unit
+def test_query_cache_does_not_store_failures():
+    """Test that a failed load is retried on the next lookup."""
+    cache = metrics_api.QueryCache(ttl=60, max_entries=8)
+    assert cache.get_or_load('up', lambda: None) is None
+    assert cache.get_or_load('up', lambda: 'ok') == 'ok'
+
+
+@pytest.mark.unit
+def test_dashboard_returns_requested_fields(client):
+    """Test that /api/metrics/dashboard builds only the selected sections."""
+    queries = []
+
+    def query(q):
+        queries.append(q)
+        return vector(3, app='portfolio', country='US', instance='pi')
+
+    with patch('app.routes.metrics_api.query_prometheus', side_effect=query), \
+            patch.object(metrics_api, 'METRICS_SOURCE', 'prometheus'):
+        response = client.get('/api/metrics/dashboard?fields=system,geographic')
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert set(body['data']) == {'system', 'geographic'}
+    assert body['data']['geographic'] == [{'country': 'US', 'requests': 3}]
+    assert body['missing'] == {'system': [], 'geographic': []}
+    assert len(queries) == len(metrics_api.SYSTEM_QUERIES) + 1
+
+
+@pytest.mark.unit
+def test_dashboard_rejects_unknown_fields(client):
+    """Test that an unknown section name is a client error."""
+    response = client.get('/api/metrics/dashboard?fields=live,bogus')
+    assert response.status_code == 400
+    assert 'bogus' in response.get_json()['error']
+
+
+@pytest.mark.unit
+def test_timeseries_downsampled_columnar(client):
+    """Test that /api/metrics/timeseries honours window, max_points and format."""
+    windows = []
+
+    def range_query(query, start, end, step):
+        windows.append(end - start)
+        values = [[start + i * step, str(i)] for i in range((end - start) // step)]
+        return {'status': 'success', 'data': {'resultType': 'matrix', 'result': [
+            {'metric': {'app': 'portfolio'}, 'values': values}
+        ]}}
+
+    with patch('app.routes.metrics_api.query_prometheus_range', side_effect=range_query):
+        response = client.get('/api/metrics/timeseries?window=7d&max_points=100&format=columnar')
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert windows == [7 * 86400] * len(metrics_api.TIMESERIES_QUERIES)
+    series = body['data']['request_rate_series']
+    assert len(series['timestamps']) == 100
+    assert len(series['series'][0]['values']) == 100
+
+
+@pytest.mark.unit
+def test_timeseries_rejects_bad_options(client):
+    """Test that malformed time-series options are client errors."""
+    assert client.get('/api/metrics/timeseries?window=30d').status_code == 400
+    assert client.get('/api/metrics/timeseries?max_points=1').status_code == 400
+    assert client.get('/api/metrics/timeseries?format=csv').status_code == 400
+
+
+@pytest.mark.unit
+def test_timeseries_since_returns_only_new_points(client):
+    """Test that a since cursor yields only points after it."""
+    metrics_api._series_windows.clear()
+
+    def range_query(query, start, end, step):
+        values = [[ts, '1'] for ts in range(start, end + 1, step)]
+        return {'status': 'success', 'data': {'resultType': 'matrix', 'result': [
+            {'metric': {'app': 'portfolio'}, 'values': values}
+        ]}}
+
+    with patch('app.routes.metrics_api.query_prometheus_range', side_effect=range_query):
+        full = client.get('/api/metrics/timeseries').get_json()['data']
+        cursor = full['cursor']
+        delta = client.get(f'/api/metrics/timeseries?since={cursor - 600}').get_json()['data']
+
+    assert full['incremental'] is False
+    assert len(full['request_rate_series'][0]['values']) == metrics_api.DEFAULT_OPTIONS['window'] // 300 + 1
+    assert delta['incremental'] is True
+    assert [v[0] for v in delta['request_rate_series'][0]['values']] == [cursor - 300, cursor]
+
+
+@pytest.mark.unit
+def test_live_falls_back_to_local_store(client):
+    """Test that failed Prometheus queries are answered from the in-process store."""
+    client.get('/journey')
+    with patch('app.routes.metrics_api.query_prometheus', return_value=None):
+        response = client.get('/api/metrics/live')
+
+    body = response.get_json()
+    assert body['missing'] == []
+    assert sorted(body['local']) == sorted(metrics_api.LIVE_QUERIES)
+    assert body['data']['total_requests_24h'][0]['value'] >= 1
+    assert body['data']['uptime'] == [
+        {'app': 'pra', 'job': 'pra_app', 'status': 'unknown'},
+        {'app': 'portfolio', 'job': 'portfolio_app', 'status': 'unknown'},
+    ]
+
+
+@pytest.mark.unit
+def test_local_source_skips_prometheus(client):
+    """Test that METRICS_SOURCE=local never queries Prometheus for request metrics."""
+    with patch('app.routes.metrics_api.query_prometheus_range') as range_query, \
+            patch.object(metrics_api, 'METRICS_SOURCE', 'local'):
+        response = client.get('/api/metrics/timeseries?window=1h')
+
+    body = response.get_json()
+    range_query.assert_not_called()
+    assert body['local'] == ['request_rate_series', 'response_time_series']
+    assert body['data']['cursor'] % metrics_api.TIMESERIES_STEP == 0
+
+
+@pytest.fixture
+def open_breaker():
+    """Prometheus breaker forced open, with the query cache emptied around the test."""
+    breaker = CircuitBreaker('prometheus-test', min_calls=1, cooldown=60)
+    breaker.record_failure()
+    metrics_api._query_cache.clear()
+    with patch.object(metrics_api, 'prometheus_breaker', breaker):
+        yield breaker
+    metrics_api._query_cache.clear()
+
+
+@pytest.mark.unit
+def test_open_circuit_serves_stale_data_without_calling_prometheus(client, open_breaker):
+    """Test that an open circuit fails fast and the last good response is marked stale."""
+    key = (metrics_api.PROMETHEUS_URL, (('query', metrics_api.SYSTEM_QUERIES['cpu_usage']),))
+    metrics_api._query_cache._entries[key] = (0, vector(12.5, instance='pi'))
+
+    with patch('app.routes.metrics_api.http_client.get') as upstream:
+        response = client.get('/api/metrics/system')
+
+    upstream.assert_not_called()
+    body = response.get_json()
+    assert body['stale'] is True
+    assert body['stale_queries'] == ['cpu_usage']
+    assert body['data']['cpu_usage'] == 12.5
+    assert sorted(body['missing']) == ['disk_usage', 'memory_usage']
+
+
+@pytest.mark.unit
+def test_health_reports_breaker_without_querying(client, open_breaker):
+    """Test that health reflects the circuit state and makes no upstream call."""
+    with patch('app.routes.metrics_api.http_client.get') as upstream:
+        response = client.get('/api/metrics/health')
+
+    upstream.assert_not_called()
+    assert response.status_code == 503
+    assert response.get_json()['circuit']['state'] == 'open'
+
+
+@pytest.mark.unit
+def test_geographic_is_answered_from_shared_top_k(client):
+    """Test that countries come from the merged top-k tracker without the 24h topk query."""
+    for _ in range(3):
+        client.get('/journey', headers={'CF-IPCountry': 'NZ'})
+
+    with patch('app.routes.metrics_api.query_prometheus') as query:
+        body = client.get('/api/metrics/geographic').get_json()
+
+    query.assert_not_called()
+    assert body['local'] == ['countries']
+    nz = next(entry for entry in body['data'] if entry['country'] == 'NZ')
+    assert nz['requests'] - nz['error'] <= 3 <= nz['requests']
+
+
+@pytest.mark.unit
+def test_geographic_queries_prometheus_while_tracker_is_empty(client):
+    """Test that Prometheus answers only until the tracker has seen any traffic."""
+    empty = ([], 0)
+    with patch.object(metrics_api.local_metrics.shared_countries, 'top', return_value=empty), \
+            patch('app.routes.metrics_api.query_prometheus',
+                  return_value=vector(4, country='US')) as query:
+        body = client.get('/api/metrics/geographic').get_json()
+
+    query.assert_called_once()
+    assert body['local'] == []
+    assert body['data'] == [{'country': 'US', 'requests': 4}]
@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from metrics_store import (
+    DURATION_BUCKETS, LocalMetricsStore, SharedTopK, SpaceSaving, WindowedTopK, merge_summaries, quantile
+)
+
+T0 = 1_000_000.0
+
+
+@pytest.mark.unit
+def test_summary_rate_p95_and_error_rate():
+    """Test that window aggregates match the recorded requests."""
+    store = LocalMetricsStore()
+    for i in range(100):
+        store.record(503 if i < 5 else 200, 0.2 if i < 10 else 0.004, now=T0 + i)
+
+    summary = store.summary(300, now=T0 + 100)
+    assert summary['requests'] == 100
+    assert summary['request_rate'] == pytest.approx(100 / 300)
+    assert summary['error_rate'] == pytest.approx(5.0)
+    assert 100 < summary['response_time_p95'] <= 250
+
+
+@pytest.mark.unit
+def test_old_buckets_expire_from_the_window():
+    """Test that requests older than the window and reused slots stop counting."""
+    store = LocalMetricsStore()
+    store.record(200, 0.01, now=T0)
+    store.record(200, 0.01, now=T0 + 3600 + 400)
+
+    assert store.summary(300, now=T0 + 3600 + 400)['requests'] == 1
+    assert store.summary(24 * 3600, now=T0 + 3600 + 400)['requests'] == 2
+    assert store.summary(24 * 3600, now=T0 + 2 * 24 * 3600)['requests'] == 0
+
+
+@pytest.mark.unit
+def test_series_returns_completed_buckets():
+    """Test that the series has one point per finished 5 minute bucket."""
+    store = LocalMetricsStore()
+    start = T0 // 300 * 300
+    for i in range(30):
+        store.record(200, 0.02, now=start + i)
+
+    points = store.series(3600, now=start + 650)
+    assert len(points) == 12
+    assert points[-1][0] == start + 600
+    assert points[-2] == (start + 300, 30 / 300, pytest.approx(24.25))
+    assert points[-1][1:] == (0.0, None)
+
+
+@pytest.mark.unit
+def test_quantile_interpolates_within_bucket():
+    """Test the histogram_quantile-style estimate, including the +Inf bucket."""
+    counts = [0] * (len(DURATION_BUCKETS) + 1)
+    counts[1] = 10  # 5ms..10ms
+    assert quantile(0.5, counts) == pytest.approx(0.0075)
+    assert quantile(0.5, [0] * len(counts)) is None
+
+    counts[-1] = 1000
+    assert quantile(0.95, counts) == DURATION_BUCKETS[-1]
+
+
+@pytest.mark.unit
+def test_space_saving_bounds_hold_when_counters_are_replaced():
+    """Test that every reported count brackets the true count within its error."""
+    summary = SpaceSaving(capacity=3)
+    stream = ['US'] * 50 + ['FR'] * 20 + ['DE', 'JP', 'BR', 'IN'] * 3 + ['FR'] * 5
+    truth = {item: stream.count(item) for item in set(stream)}
+    for item in stream:
+        summary.add(item)
+
+    assert len(summary.counters) == 3
+    for item, (count, error) in summary.counters.items():
+        assert count - error <= truth[item] <= count
+    assert summary.counters['US'] == [50, 0]
+
+
+@pytest.mark.unit
+def test_windowed_top_k_drops_expired_hours():
+    """Test that the window merges recent hourly buckets and forgets older ones."""
+    tracker = WindowedTopK(capacity=4, bucket_seconds=3600, buckets=24)
+    for _ in range(10):
+        tracker.add('US', now=T0)
+    for _ in range(4):
+        tracker.add('FR', now=T0 + 3600)
+    tracker.add('US', now=T0 + 2 * 3600)
+
+    entries, total = tracker.top(2, now=T0 + 2 * 3600)
+    assert [(e['item'], e['count'], e['error']) for e in entries] == [('US', 11, 0), ('FR', 4, 0)]
+    assert total == 15
+
+    entries, total = tracker.top(2, now=T0 + 24 * 3600)
+    assert [(e['item'], e['count']) for e in entries] == [('FR', 4), ('US', 1)]
+    assert total == 5
+
+
+@pytest.mark.unit
+def test_merge_summaries_adds_floors_for_missing_items():
+    """Test that an item absent from a summary is charged that summary's floor."""
+    counters, floor = merge_summaries([({'US': [10, 0], 'FR': [4, 1]}, 2), ({'US': [5, 0]}, 3)], capacity=4)
+    assert counters == {'US': [15, 0], 'FR': [7, 4]}
+    assert floor == 5
+
+
+def worker_tracker(tmp_path, items):
+    tracker = WindowedTopK(capacity=4, bucket_seconds=3600, buckets=24)
+    for item in items:
+        tracker.add(item, now=T0)
+    return SharedTopK(tracker, directory=str(tmp_path))
+
+
+@pytest.mark.unit
+def test_shared_top_k_merges_every_workers_summaries(tmp_path):
+    """Test that a read sees the other workers' published counts, within bounds."""
+    other = worker_tracker(tmp_path, ['US'] * 6 + ['FR'] * 2)
+    other.publish(now=T0)
+    os.replace(other._path(os.getpid()), other._path(101))
+    shared = worker_tracker(tmp_path, ['US'] * 3 + ['DE'])
+
+    entries, total = shared.top(2, now=T0 + 1)
+    assert [(e['item'], e['count'], e['error']) for e in entries] == [('US', 9, 0), ('FR', 2, 0)]
+    assert total == 12
+
+    shared.archive(101, now=T0 + 1)
+    assert not os.path.exists(shared._path(101))
+    shared._cached = None
+    entries, total = shared.top(1, now=T0 + 2)
+    assert entries[0]['item'] == 'US' and entries[0]['count'] == 9
+    assert total == 12
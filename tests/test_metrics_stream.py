@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from app.metrics_stream import MetricsBroadcaster
+
+
+def read_events(subscription, count):
+    """Read the next `count` metrics events (skipping retry/keepalive chunks)."""
+    events = []
+    for chunk in subscription:
+        if chunk.startswith(b'id: '):
+            events.append(chunk)
+            if len(events) == count:
+                break
+    return events
+
+
+def event_id(chunk):
+    return int(chunk.split(b'\n', 1)[0][len(b'id: '):])
+
+
+@pytest.mark.unit
+def test_one_producer_call_per_tick_for_all_clients():
+    """Test that every subscriber receives the same event from a single produce call."""
+    calls = []
+    broadcaster = MetricsBroadcaster(lambda: calls.append(1) or {'tick': len(calls)},
+                                     interval=0.05, max_clients=10, heartbeat=1)
+
+    subscriptions = [broadcaster.subscribe() for _ in range(5)]
+    received = [read_events(subscription, 1)[0] for subscription in subscriptions]
+    for subscription in subscriptions:
+        subscription.close()
+
+    assert len(set(received)) == 1
+    assert len(calls) <= 2
+    assert broadcaster.clients == 0
+
+
+@pytest.mark.unit
+def test_connection_limit():
+    """Test that subscribers past max_clients are refused until a slot frees up."""
+    broadcaster = MetricsBroadcaster(lambda: {}, interval=0.05, max_clients=1, heartbeat=1)
+
+    first = broadcaster.subscribe()
+    assert broadcaster.subscribe() is None
+
+    first.close()
+    second = broadcaster.subscribe()
+    assert second is not None
+    second.close()
+
+
+@pytest.mark.unit
+def test_resume_replays_missed_events():
+    """Test that Last-Event-ID replays buffered events newer than the client's last one."""
+    gate = threading.Event()
+    broadcaster = MetricsBroadcaster(lambda: gate.wait() and None, interval=0.05, max_clients=5, heartbeat=0.05)
+    ids = [broadcaster.publish({'n': n}) for n in range(3)]
+
+    subscription = broadcaster.subscribe(last_event_id=str(ids[0]))
+    replayed = read_events(subscription, 2)
+    subscription.close()
+    gate.set()
+
+    assert [event_id(chunk) for chunk in replayed] == ids[1:]
+
+
+@pytest.mark.unit
+def test_heartbeat_when_idle():
+    """Test that an idle stream emits keepalive comments."""
+    gate = threading.Event()
+    broadcaster = MetricsBroadcaster(lambda: gate.wait() and None, interval=0.05, max_clients=5, heartbeat=0.05)
+
+    subscription = broadcaster.subscribe()
+    assert next(subscription).startswith(b'retry: ')
+    assert next(subscription) == b': keepalive\n\n'
+    subscription.close()
+    gate.set()
+
+
+@pytest.mark.unit
+def test_producer_restart_resets_cursor():
+    """Test that each producer run starts from a reset cursor and fresh clients skip the old run."""
+    cursors = []
+
+    def produce():
+        cursors.append(broadcaster.cursor)
+        broadcaster.cursor = len(cursors)
+        return {'since': cursors[-1]}
+
+    broadcaster = MetricsBroadcaster(produce, interval=0.05, max_clients=5, heartbeat=1)
+    first = broadcaster.subscribe()
+    read_events(first, 2)
+    first.close()
+    while broadcaster._producer is not None:
+        threading.Event().wait(0.01)
+
+    second = broadcaster.subscribe()
+    event = read_events(second, 1)[0]
+    second.close()
+
+    assert cursors[:2] == [None, 1]
+    assert None in cursors[2:]
+    assert event.endswith(b'data: {"since":null}\n\n')
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each run is a separate worker process recording into the shared directory
+WORKER = """
+import sys
+from flask import Flask
+import log_pipeline
+from telemetry_middleware import setup_telemetry
+
+app = Flask(__name__)
+app.route('/ok')(lambda: 'ok')
+setup_telemetry(app, app_name='mp', log_handlers=[], log_rules=[{'path': '*', 'sample': 0.0, 'errors': 0.0}])
+client = app.test_client()
+for _ in range(int(sys.argv[1])):
+    client.get('/ok')
+if len(sys.argv) > 2:
+    sys.stdout.write(client.get('/metrics').get_data(as_text=True))
+log_pipeline.shutdown()
+"""
+
+
+def run_worker(metrics_dir, requests, scrape=False):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(metrics_dir))
+    args = [sys.executable, '-c', WORKER, str(requests)] + (['scrape'] if scrape else [])
+    return subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+
+
+def sample(text, prefix):
+    return sum(float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(prefix))
+
+
+@pytest.mark.integration
+def test_scrape_aggregates_every_worker(tmp_path):
+    """Test that /metrics sums counters written by other worker processes."""
+    run_worker(tmp_path, 2)
+    run_worker(tmp_path, 3)
+    text = run_worker(tmp_path, 1, scrape=True)
+
+    assert sample(text, 'http_requests_total{') == 6
+    assert sample(text, 'http_request_duration_seconds_count{') == 6
+
+
+@pytest.mark.integration
+def test_dead_worker_gauges_are_dropped(tmp_path):
+    """Test that mark_worker_dead removes a worker's livesum gauge file."""
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    code = (
+        "import os, telemetry_middleware as t; "
+        "t.http_requests_in_flight.labels(app='mp').inc(); "
+        "t.mark_worker_dead(os.getpid()); "
+        "print(sorted(os.listdir(os.environ['PROMETHEUS_MULTIPROC_DIR'])))"
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+
+    assert 'gauge_livesum' not in out
+
+
+@pytest.mark.integration
+def test_recycled_worker_files_are_archived(tmp_path, monkeypatch):
+    """Test that a dead worker's counter/histogram files are removed but its totals kept."""
+    import telemetry_middleware
+
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    dead_pids = set()
+    # Two recycled workers: the second is added into the existing archive
+    for requests in (2, 3):
+        run_worker(tmp_path, requests)
+        pids = {name[len('counter_'):-3] for name in os.listdir(tmp_path)
+                if name.startswith('counter_') and name != 'counter_archive.db'}
+        for pid in pids:
+            telemetry_middleware.mark_worker_dead(int(pid))
+        dead_pids |= pids
+
+    leftovers = [name for name in os.listdir(tmp_path)
+                 if any(name == f'{typ}_{pid}.db' for typ in ('counter', 'histogram') for pid in dead_pids)]
+    assert leftovers == []
+    assert 'counter_archive.db' in os.listdir(tmp_path)
+
+    text = run_worker(tmp_path, 1, scrape=True)
+    assert sample(text, 'http_requests_total{') == 6
+    assert sample(text, 'http_request_duration_seconds_count{') == 6
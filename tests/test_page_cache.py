@@ -0,0 +1,85 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask, render_template_string
+
+from app.page_cache import PageCache
+
+
+@pytest.fixture
+def page_app(tmp_path):
+    """App with one cached page rendered from a temporary template folder."""
+    template = tmp_path / 'page.html'
+    template.write_text('<p>version 1</p>' + ' padding' * 50)
+    app = Flask(__name__, template_folder=str(tmp_path))
+    cache = PageCache()
+    app.renders = 0
+
+    @app.route('/page')
+    @cache.cached
+    def page():
+        app.renders += 1
+        return render_template_string(template.read_text())
+
+    @app.route('/missing')
+    @cache.cached
+    def missing():
+        app.renders += 1
+        return 'gone', 404
+
+    app.template = template
+    return app
+
+
+@pytest.mark.unit
+def test_hits_skip_rendering_and_revalidate(page_app):
+    """Test that repeat requests reuse the rendered bytes and matching ETags get 304."""
+    client = page_app.test_client()
+    first = client.get('/page')
+    second = client.get('/page')
+
+    assert page_app.renders == 1
+    assert first.data == second.data
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    revalidated = client.get('/page', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+
+@pytest.mark.unit
+def test_gzip_variant_has_its_own_etag(page_app):
+    """Test that gzip-capable clients get the pre-compressed body under a distinct ETag."""
+    client = page_app.test_client()
+    plain = client.get('/page')
+    compressed = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert compressed.headers['Vary'] == 'Accept-Encoding'
+
+
+@pytest.mark.unit
+def test_errors_are_not_cached(page_app):
+    """Test that non-200 responses always go through the view."""
+    client = page_app.test_client()
+    client.get('/missing')
+    assert client.get('/missing').status_code == 404
+    assert page_app.renders == 2
+
+
+@pytest.mark.unit
+def test_dev_mode_rerenders_after_template_change(page_app):
+    """Test that editing a template invalidates cached pages in debug mode."""
+    page_app.debug = True
+    client = page_app.test_client()
+    client.get('/page')
+
+    page_app.template.write_text('<p>version 2</p>')
+    stat = os.stat(page_app.template)
+    os.utime(page_app.template, (stat.st_atime, stat.st_mtime + 5))
+
+    assert b'version 2' in client.get('/page').data
+    assert page_app.renders == 2
@@ -18,7 +18,7 @@ def test_home_route_status(client):
         }
     }
 
-    with patch('app.routes.main.requests.get', return_value=mock_response):
+    with patch('app.routes.main.http_client.get', return_value=mock_response):
         response = client.get('/')
         assert response.status_code == 200
 
@@ -0,0 +1,85 @@
+import gzip
+import re
+
+import pytest
+
+
+def asset_href(app, logical):
+    return '/assets/' + app.extensions['static_assets'].urls[logical]
+
+
+@pytest.mark.unit
+def test_templates_link_fingerprinted_assets(client):
+    """Test that pages reference content-hashed /assets URLs."""
+    html = client.get('/journey').get_data(as_text=True)
+    assert re.search(r'/assets/css/styles\.[0-9a-f]{10}\.css', html)
+    assert "/static/css/styles.css" not in html
+
+
+@pytest.mark.unit
+def test_text_asset_is_precompressed_and_immutable(app, client):
+    """Test that gzip is negotiated and the response can be cached forever."""
+    url = asset_href(app, 'css/styles.css')
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    with open('app/static/css/styles.css', 'rb') as f:
+        assert gzip.decompress(response.data) == f.read()
+
+    plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert len(plain.data) > len(response.data)
+
+
+@pytest.mark.unit
+def test_brotli_preferred_when_accepted(app, client):
+    """Test that clients accepting br get the brotli variant."""
+    brotli = pytest.importorskip('brotli')
+    url = asset_href(app, 'css/styles.css')
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    with open('app/static/css/styles.css', 'rb') as f:
+        assert brotli.decompress(response.data) == f.read()
+
+
+@pytest.mark.unit
+def test_revalidation_returns_not_modified(app, client):
+    """Test that a matching ETag gets a bodyless 304."""
+    url = asset_href(app, 'css/styles.css')
+    etag = client.get(url, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+@pytest.mark.unit
+def test_stale_fingerprint_serves_current_file_uncached(client):
+    """Test that an old hash still resolves but is not cached as immutable."""
+    response = client.get('/assets/css/styles.0000000000.css')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert client.get('/assets/css/missing.0000000000.css').status_code == 404
+
+
+@pytest.mark.unit
+def test_binary_asset_supports_ranges(app, client):
+    """Test that large binary files are streamed from disk with Range support."""
+    url = asset_href(app, 'resume/FablihaFaiza.pdf')
+
+    response = client.get(url, headers={'Range': 'bytes=0-3'})
+    assert response.status_code == 206
+    assert response.data == b'%PDF'
+    assert 'immutable' in response.headers['Cache-Control']
+
+
+@pytest.mark.unit
+def test_debug_mode_uses_plain_static_urls(app):
+    """Test that debug mode skips fingerprints so edited files show up immediately."""
+    app.debug = True
+    with app.test_request_context():
+        assert app.jinja_env.globals['asset_url']('css/styles.css') == '/static/css/styles.css'
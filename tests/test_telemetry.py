@@ -0,0 +1,305 @@
+import gzip
+import logging
+
+import pytest
+from flask import Flask, render_template_string
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+import log_pipeline
+import telemetry_middleware
+from benchmarks.middleware_overhead import measure_overhead
+from metrics_store import LocalMetricsStore, WindowedTopK
+from telemetry_middleware import CountryLabels, LogSampler, MetricsExposition, RequestMetrics, phase, anonymize_ip, configure_ip_salt, parse_user_agent, setup_telemetry
+
+
+class ListHandler(logging.Handler):
+    """Handler collecting records in memory."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def telemetry_app():
+    """Bare Flask app with telemetry and an in-memory log destination."""
+    app = Flask(__name__)
+    handler = ListHandler()
+
+    @app.route('/ok')
+    def ok():
+        return 'ok'
+
+    @app.route('/boom')
+    def boom():
+        return 'boom', 500
+
+    setup_telemetry(app, app_name='test', log_handlers=[handler], log_rules=[
+        {'path': '/metrics', 'sample': 0.0, 'errors': 0.0},
+        {'path': '/ok', 'sample': 0.0},
+    ])
+    app.log_records = handler.records
+    yield app
+    log_pipeline.shutdown()
+
+
+def request_messages(app):
+    log_pipeline.shutdown()
+    return [(r.getMessage(), getattr(r, 'path', None)) for r in app.log_records]
+
+
+@pytest.mark.unit
+def test_sampled_out_and_scrape_requests_are_not_logged(telemetry_app):
+    """Test that suppressed routes do not produce per-request log records."""
+    client = telemetry_app.test_client()
+    client.get('/metrics')
+    client.get('/ok')
+    client.get('/boom')
+
+    assert request_messages(telemetry_app) == [('HTTP request', '/boom')]
+
+
+@pytest.mark.unit
+def test_errors_are_kept_on_sampled_routes():
+    """Test that 4xx/5xx are logged even when successes are sampled at 0%."""
+    sampler = LogSampler([{'path': '/api/*', 'sample': 0.0}])
+
+    assert not sampler.should_log('/api/metrics/live', 200)
+    assert sampler.should_log('/api/metrics/live', 503)
+    assert sampler.should_log('/journey', 200)
+
+
+@pytest.mark.unit
+def test_never_log_rule_drops_errors_too():
+    """Test that a rule with errors=0 suppresses every request on that path."""
+    sampler = LogSampler()
+
+    assert not sampler.should_log('/metrics', 200)
+    assert not sampler.should_log('/health', 500)
+
+
+@pytest.mark.unit
+def test_suppressed_requests_are_summarized():
+    """Test that suppressed requests roll up into per-route summaries once per window."""
+    sampler = LogSampler(summary_interval=60)
+    sampler.suppress('metrics', 200, 0.002)
+    sampler.suppress('metrics', 200, 0.004)
+    sampler.suppress('health', 503, 0.010)
+
+    assert sampler.flush_due(now=sampler._window_start + 1) == []
+    summaries = {s['route']: s for s in sampler.flush_due(now=sampler._window_start + 60)}
+
+    assert summaries['metrics']['count'] == 2
+    assert summaries['metrics']['total_duration_ms'] == 6.0
+    assert summaries['metrics']['max_duration_ms'] == 4.0
+    assert summaries['health']['status_class'] == '5xx'
+    assert sampler.flush_due(now=sampler._window_start + 120) == []
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('ua, browser, os_name', [
+    ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/126.0 Safari/537.36 Edg/126.0', 'Edge', 'Windows'),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/126.0 Safari/537.36 OPR/111.0', 'Opera', 'macOS'),
+    ('Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/126.0 Mobile Safari/537.36', 'Chrome', 'Android'),
+    ('Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 '
+     '(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1', 'Safari', 'iOS'),
+    ('Mozilla/5.0 (iPad; CPU OS 17_5 like Mac OS X) AppleWebKit/605.1.15', 'unknown', 'iOS'),
+    ('curl/8.5.0', 'unknown', 'unknown'),
+])
+def test_user_agent_precedence(ua, browser, os_name):
+    """Test that more specific browser and OS tokens win over the generic ones they embed."""
+    assert parse_user_agent(ua) == {'browser': browser, 'os': os_name}
+
+
+@pytest.mark.unit
+def test_ip_hashes_are_cached_per_salt():
+    """Test that hashes are memoized and recomputed when the salt changes."""
+    configure_ip_salt('first')
+    first = anonymize_ip('203.0.113.7')
+    assert anonymize_ip('203.0.113.7') == first
+    assert telemetry_middleware._ip_hash_cache.get('203.0.113.7') == first
+
+    configure_ip_salt('second')
+    assert anonymize_ip('203.0.113.7') != first
+    configure_ip_salt()
+
+
+@pytest.mark.unit
+def test_ttl_cache_expires_and_evicts():
+    """Test that entries expire after the TTL and the oldest is evicted past maxsize."""
+    cache = telemetry_middleware._TTLCache(maxsize=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    cache.ttl = -1
+    cache.put('d', 4)
+    assert cache.get('d') is None
+
+
+@pytest.mark.slow
+def test_middleware_overhead_under_budget():
+    """Test that telemetry adds less than 2ms per request over a bare Flask app."""
+    result = measure_overhead(requests=300, rounds=3)
+    assert result['overhead_ms'] < 2.0
+
+
+def isolated_request_metrics(**kwargs):
+    registry = CollectorRegistry()
+    metrics = RequestMetrics(
+        'test',
+        Counter('requests', '', ['method', 'route', 'status_code', 'app', 'country'], registry=registry),
+        Histogram('duration', '', ['method', 'route', 'status_code', 'app'], registry=registry),
+        Counter('errors', '', ['method', 'route', 'status_code', 'app', 'error_type'], registry=registry),
+        local=LocalMetricsStore(),
+        **kwargs
+    )
+    return metrics, registry
+
+
+@pytest.mark.unit
+def test_request_metrics_reuse_bound_children():
+    """Test that repeated label combinations record into one cached child per metric."""
+    metrics, registry = isolated_request_metrics()
+
+    metrics.record('GET', 'main.base', 200, 'FR', 0.01)
+    metrics.record('GET', 'main.base', 200, 'FR', 0.02)
+    metrics.record('GET', 'main.base', 503, 'FR', 0.03)
+
+    assert metrics.children('GET', 'main.base', 200, 'FR') is metrics.children('GET', 'main.base', 200, 'FR')
+    assert metrics.children('GET', 'main.base', 200, 'FR')[2] is None
+    labels = {'method': 'GET', 'route': 'main.base', 'app': 'test'}
+    assert registry.get_sample_value('requests_total', dict(labels, status_code='200', country='FR')) == 2
+    assert registry.get_sample_value('duration_count', dict(labels, status_code='200')) == 2
+    assert registry.get_sample_value('errors_total', dict(labels, status_code='503', error_type='server_error')) == 1
+
+
+@pytest.mark.unit
+def test_unregistered_paths_share_one_route_label(telemetry_app):
+    """Test that scanner 404s are recorded under route 'unmatched', not their raw paths."""
+    client = telemetry_app.test_client()
+    client.get('/wp-admin/setup.php')
+    client.get('/.env')
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'route="unmatched"' in body
+    assert 'wp-admin' not in body and '.env' not in body
+
+
+@pytest.mark.unit
+def test_countries_outside_top_n_collapse_to_other():
+    """Test that only the busiest countries keep their own label value."""
+    metrics, registry = isolated_request_metrics()
+    metrics.countries = CountryLabels(top_n=2, tracker=metrics.local.countries)
+    for country in ['US'] * 5 + ['FR'] * 3 + ['DE', 'JP']:
+        metrics.record('GET', 'main.base', 200, country, 0.01)
+
+    def requests(country):
+        return registry.get_sample_value('requests_total', {
+            'method': 'GET', 'route': 'main.base', 'status_code': '200', 'app': 'test', 'country': country})
+
+    assert (requests('US'), requests('FR'), requests('other')) == (5, 3, 2)
+    assert requests('DE') is None
+
+
+@pytest.mark.unit
+def test_rotating_countries_stay_within_label_cap():
+    """Test that countries rotating through the top-k never exceed max_labels distinct labels."""
+    tracker = WindowedTopK(capacity=8)
+    countries = CountryLabels(top_n=2, tracker=tracker, refresh_interval=0)
+    emitted = set()
+    for interval in range(10):
+        # Each interval's pair outnumbers everything before it, so the top-k keeps rotating
+        for country in [f'A{interval}'] * 10 * (interval + 1) + [f'B{interval}'] * (10 * interval + 5):
+            tracker.add(country)
+            emitted.add(countries.label(country))
+
+    emitted.discard('other')
+    assert {'A0', 'B0'} <= emitted
+    assert len(emitted) <= countries.max_labels == 4
+
+
+@pytest.mark.unit
+def test_series_budget_overflows_into_other():
+    """Test that label sets past the budget are folded into one overflow series."""
+    metrics, registry = isolated_request_metrics(series_budget=2)
+    for route in ('a', 'b', 'c', 'd'):
+        metrics.record('GET', route, 404, 'US', 0.01)
+    metrics.record('BREW', 'a', 405, 'US', 0.01)
+
+    assert registry.get_sample_value('requests_total', {
+        'method': 'GET', 'route': 'other', 'status_code': '404', 'app': 'test', 'country': 'other'}) == 2
+    assert registry.get_sample_value('requests_total', {
+        'method': 'other', 'route': 'other', 'status_code': '405', 'app': 'test', 'country': 'other'}) == 1
+    assert len(metrics._children) == 4
+
+
+@pytest.mark.unit
+def test_metrics_endpoint_negotiates_openmetrics_and_gzip(telemetry_app):
+    """Test that /metrics serves OpenMetrics on request and gzips for clients that accept it."""
+    client = telemetry_app.test_client()
+    client.get('/')
+
+    response = client.get('/metrics', headers={
+        'Accept': 'application/openmetrics-text; version=1.0.0',
+        'Accept-Encoding': 'gzip',
+    })
+    assert response.content_type.startswith('application/openmetrics-text')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data).decode().rstrip().endswith('# EOF')
+
+    plain = client.get('/metrics')
+    assert plain.content_type.startswith('text/plain')
+    assert 'Content-Encoding' not in plain.headers
+
+
+@pytest.mark.unit
+def test_metrics_snapshot_is_reused_within_ttl(monkeypatch):
+    """Test that scrapes within the TTL share one serialization per format."""
+    registry = CollectorRegistry()
+    counter = Counter('scrapes_demo', 'demo', registry=registry)
+    now = [100.0]
+    monkeypatch.setattr(telemetry_middleware.time, 'monotonic', lambda: now[0])
+    exposition = MetricsExposition(ttl=5, source=registry)
+
+    first, _ = exposition.render()
+    counter.inc()
+    assert exposition.render()[0] is first
+    assert b'scrapes_demo_total 0.0' in first
+
+    now[0] += 5
+    assert b'scrapes_demo_total 1.0' in exposition.render()[0]
+
+
+@pytest.mark.unit
+def test_phases_reach_server_timing_and_histogram(telemetry_app):
+    """Test that named spans, rendering and middleware show up per request."""
+    @telemetry_app.route('/phased')
+    def phased():
+        with phase('upstream.demo'):
+            pass
+        return render_template_string('{{ 1 + 1 }}')
+
+    response = telemetry_app.test_client().get('/phased')
+    names = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert names == ['middleware', 'upstream.demo', 'render', 'total']
+
+    body = telemetry_app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'http_request_phase_seconds_count{app="test",phase="render"}' in body
+
+
+@pytest.mark.unit
+def test_phase_outside_a_request_is_ignored():
+    """Test that background threads can share instrumented code without a request."""
+    with phase('upstream.demo'):
+        pass
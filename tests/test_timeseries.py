@@ -0,0 +1,99 @@
+import pytest
+
+from app.timeseries import SeriesWindow, downsample, lttb_indices, to_columnar
+
+
+@pytest.mark.unit
+def test_lttb_keeps_endpoints_and_peaks():
+    """Test that downsampling keeps the first, last and extreme points."""
+    xs = list(range(1000))
+    ys = [0.0] * 1000
+    ys[400] = 50.0
+    ys[700] = -20.0
+
+    indices = lttb_indices(xs, ys, 50)
+
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert 400 in indices and 700 in indices
+    assert indices == sorted(indices)
+
+
+@pytest.mark.unit
+def test_downsample_returns_original_pairs():
+    """Test that Prometheus pairs are kept verbatim and short series are untouched."""
+    values = [[1700000000 + i * 300, str(i % 7)] for i in range(100)]
+
+    assert downsample(values, 200) is values
+    reduced = downsample(values, 10)
+    assert len(reduced) == 10
+    assert all(pair in values for pair in reduced)
+
+
+@pytest.mark.unit
+def test_downsample_tolerates_nan():
+    """Test that NaN samples (no traffic) do not break point selection."""
+    values = [[i, 'NaN' if i % 3 else str(i)] for i in range(30)]
+    assert len(downsample(values, 5)) == 5
+
+
+@pytest.mark.unit
+def test_columnar_aligns_series_on_shared_timestamps():
+    """Test that columnar encoding shares timestamps and fills gaps with None."""
+    series = [
+        {'metric': {'app': 'portfolio'}, 'values': [[10, '1'], [20, '2']]},
+        {'metric': {'app': 'pra'}, 'values': [[20, '3'], [30, 'NaN']]},
+    ]
+
+    encoded = to_columnar(series)
+
+    assert encoded['timestamps'] == [10, 20, 30]
+    assert encoded['series'][0]['values'] == [1.0, 2.0, None]
+    assert encoded['series'][1]['values'] == [None, 3.0, None]
+
+
+def fake_range(calls):
+    """Range fetcher producing one point per 10 s step and recording requested ranges."""
+    def fetch(start, end):
+        calls.append((start, end))
+        return [{'metric': {'app': 'portfolio'}, 'values': [[ts, str(ts)] for ts in range(start, end + 1, 10)]}]
+    return fetch
+
+
+@pytest.mark.unit
+def test_series_window_extends_incrementally():
+    """Test that later refreshes only fetch the steps added since the last one."""
+    calls = []
+    window = SeriesWindow(window=100, step=10)
+
+    assert window.refresh(fake_range(calls), 1000)
+    assert window.refresh(fake_range(calls), 1000)
+    assert window.refresh(fake_range(calls), 1020)
+
+    assert calls == [(900, 1000), (1010, 1020)]
+    values = window.series()[0]['values']
+    assert values[0][0] == 920 and values[-1][0] == 1020
+    assert [v[0] for v in window.series(since=1000)[0]['values']] == [1010, 1020]
+
+
+@pytest.mark.unit
+def test_series_window_refetches_after_long_gap():
+    """Test that a gap longer than the window triggers a full fetch."""
+    calls = []
+    window = SeriesWindow(window=100, step=10)
+    window.refresh(fake_range(calls), 1000)
+    window.refresh(fake_range(calls), 2000)
+
+    assert calls == [(900, 1000), (1900, 2000)]
+    assert window.series()[0]['values'][0][0] == 1900
+
+
+@pytest.mark.unit
+def test_series_window_failed_fetch_keeps_state():
+    """Test that a failed incremental fetch leaves the window unchanged."""
+    calls = []
+    window = SeriesWindow(window=100, step=10)
+    window.refresh(fake_range(calls), 1000)
+
+    assert not window.refresh(lambda start, end: None, 1010)
+    assert window.end == 1000
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from app.weather_cache import WeatherCache
+
+
+WEATHER = {'location': 'San Francisco', 'temp': 20, 'condition': 'Sunny', 'icon': ''}
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def warmed(cache):
+    cache.warm()
+    assert wait_for(lambda: cache._entry is not None)
+    return cache
+
+
+@pytest.mark.unit
+def test_cold_miss_loads_in_background_then_hits():
+    """Test that the first lookup does not wait on the loader and later lookups hit the cache."""
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return WEATHER
+
+    cache = WeatherCache(loader, ttl=60)
+    assert cache.get() is None
+    assert cache.get() is None
+    release.set()
+
+    assert wait_for(lambda: cache.get() == WEATHER)
+    assert cache.get() == WEATHER
+    assert len(calls) == 1
+
+
+@pytest.mark.unit
+def test_stale_entry_served_while_refreshing():
+    """Test that stale data is returned immediately and refreshed in the background."""
+    results = [dict(WEATHER, temp=20), dict(WEATHER, temp=25)]
+    cache = warmed(WeatherCache(lambda: results.pop(0), ttl=0.05))
+
+    assert cache.get()['temp'] == 20
+    time.sleep(0.06)
+
+    assert cache.get()['temp'] == 20
+    assert wait_for(lambda: cache.get()['temp'] == 25)
+
+
+@pytest.mark.unit
+def test_failed_refresh_keeps_last_known_good():
+    """Test that an upstream failure falls back to the last good entry."""
+    def loader():
+        if loader.fail:
+            raise ConnectionError('upstream down')
+        return WEATHER
+    loader.fail = False
+
+    cache = warmed(WeatherCache(loader, ttl=0.01))
+    assert wait_for(lambda: not cache._refreshing)
+    assert cache.get() == WEATHER
+
+    loader.fail = True
+    time.sleep(0.02)
+    assert cache.get() == WEATHER
+    assert wait_for(lambda: not cache._refreshing)
+    assert cache.get() == WEATHER
+
+
+@pytest.mark.unit
+def test_cold_miss_failure_returns_none():
+    """Test that a failing upstream with nothing cached does not raise."""
+    def loader():
+        raise ConnectionError('upstream down')
+
+    cache = WeatherCache(loader, ttl=60)
+    assert cache.get() is None
+    assert wait_for(lambda: not cache._refreshing)
+    assert cache.get() is None
+
+
+@pytest.mark.unit
+def test_shared_file_between_caches(tmp_path):
+    """Test that workers sharing a file reuse each other's entries."""
+    shared = str(tmp_path / 'weather.json')
+    first = WeatherCache(lambda: WEATHER, ttl=60, shared_path=shared)
+    second = WeatherCache(lambda: pytest.fail('second worker should not fetch'), ttl=60, shared_path=shared)
+
+    warmed(first)
+    assert second.get() == WEATHER